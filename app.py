@@ -8,143 +8,63 @@ import time
 import random
 import base64
 import os
+from html import escape
+
+from archive import MonthArchive
+from bulk import export_csv, prepare_import
+from ledger import ExpenseLedger
+from perf import ActionTimer, profiler, timed
+from storage import CouponRepository, SheetsStorage, SQLiteStorage, new_expense_id, parse_dates
+
+RUN_STARTED = time.perf_counter()
 
 # --- 1. 頁面設定 ---
 st.set_page_config(
     page_title="Everyday Moments", 
-    page_icon="icon.png", 
+    page_icon="static/icon.png" if os.path.exists("static/icon.png") else "icon.png", 
     layout="centered",
     initial_sidebar_state="expanded" 
 )
 
-# --- 🍎 專治 iPhone 主畫面圖示 ---
-def add_apple_touch_icon(image_path):
-    try:
-        if os.path.exists(image_path):
-            with open(image_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode()
-            apple_touch_icon_html = f"""
-            <link rel="apple-touch-icon" sizes="180x180" href="data:image/png;base64,{encoded_string}">
-            <link rel="icon" type="image/png" href="data:image/png;base64,{encoded_string}">
-            """
-            st.markdown(apple_touch_icon_html, unsafe_allow_html=True)
-    except Exception as e:
-        pass
-
-add_apple_touch_icon("icon.png")
-
-# --- CSS 優化 ---
-st.markdown("""
-    <style>
-    /* 隱藏預設元素 */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header[data-testid="stHeader"] {background-color: rgba(0,0,0,0); z-index: 999;}
-    
-    /* 手機版面調整 */
-    .block-container {
-        padding-top: 3rem !important; 
-        padding-bottom: 5rem !important;
-    }
-    
-    /* 輸入框與文字 */
-    .stTextInput input, .stNumberInput input, .stDateInput input {
-        font-size: 18px !important;
-        background-color: #fff9c4 !important;
-        color: #000000 !important;
-        border-radius: 12px !important;
-        height: 50px !important;
-    }
-    
-    /* 下拉選單 */
-    div[data-baseweb="select"] > div {
-        background-color: #fff9c4 !important;
-        color: #000000 !important;
-        border-radius: 12px !important;
-        height: 50px !important; 
-        align-items: center;
-    }
-    div[data-baseweb="select"] span {
-        color: #000000 !important;
-        font-size: 18px !important; 
-    }
-    
-    /* 按鈕通用 */
-    div.stButton > button {
-        width: 100%; height: 3.8em; font-size: 20px !important; font-weight: bold;
-        border-radius: 15px; border: none; margin-top: 5px;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-        transition: transform 0.1s;
-    }
-    div.stButton > button:active { transform: scale(0.98); }
-
-    .save-btn > button { background: linear-gradient(135deg, #FF6B6B 0%, #FF4B4B 100%); color: white; }
-    .del-btn > button { background-color: #6c757d; color: white; }
-    .gift-btn > button { background: linear-gradient(135deg, #FFD700 0%, #FFA500 100%); color: white; }
-    
-    /* 使用按鈕 */
-    .use-btn > button { 
-        background-color: #4CAF50 !important; 
-        color: white !important; 
-        height: 100% !important; 
-        min-height: 50px !important; 
-        font-size: 16px !important;
-        margin-top: 0px !important;
-        border-radius: 12px !important;
-    }
-    
-    /* 背包標題樣式 (綠色-持有中) */
-    .backpack-item-title {
-        font-size: 20px !important;
-        font-weight: 900 !important;
-        color: #2E7D32 !important; 
-        margin-bottom: 5px !important;
-    }
-    
-    /* 歷史標題樣式 (灰色-已使用) */
-    .history-item-title {
-        font-size: 18px !important;
-        font-weight: bold !important;
-        color: #757575 !important; 
-        text-decoration: line-through; 
-        margin-bottom: 5px !important;
-    }
-    
-    /* 信件內容樣式 */
-    .letter-box {
-        background-color: #fff9f0;
-        border: 2px dashed #FFB74D;
-        padding: 20px;
-        border-radius: 10px;
-        font-size: 16px;
-        line-height: 1.8;
-        color: #5D4037;
-        white-space: pre-wrap; 
-        box-shadow: inset 0 0 10px rgba(0,0,0,0.05);
-    }
-
-    /* Toast 通知 */
-    div[data-testid="stToast"] { 
-        position: fixed !important; top: 50% !important; left: 50% !important;       
-        transform: translate(-50%, -50%) !important; 
-        width: auto !important; min-width: 300px !important; max-width: 80vw !important;  
-        border-radius: 20px !important; background-color: rgba(255, 255, 255, 0.98) !important; 
-        box-shadow: 0 10px 40px rgba(0,0,0,0.2) !important; border: 2px solid #FF4B4B !important;
-        text-align: center !important; padding: 10px !important; z-index: 999999 !important; 
-    }
-    div[data-testid="stToast"] * { font-size: 20px !important; color: #000000 !important; justify-content: center !important; }
-    
-    .game-status { font-size: 20px; font-weight: bold; margin-bottom: 5px; text-align: center; }
-    .card-title { font-size: 19px; font-weight: bold; color: #2196F3 !important; margin-bottom: 2px; }
-    .card-note { font-size: 14px; color: inherit; opacity: 0.8; }
-    .card-amount { font-size: 20px; font-weight: bold; color: #FF4B4B; text-align: right; line-height: 1.5; }
-    .quote-box { background-color: #f0f2f6; border-left: 5px solid #FF4B4B; padding: 12px; margin-bottom: 15px; border-radius: 8px; font-style: italic; color: #555; text-align: center; font-size: 15px; }
-    .footer { text-align: center; font-size: 12px; color: #cccccc; margin-top: 30px; margin-bottom: 20px; font-family: sans-serif; }
-    </style>
-""", unsafe_allow_html=True)
+# --- 🍎 專治 iPhone 主畫面圖示 + CSS ---
+# 開了 static serving (.streamlit/config.toml) 就讓瀏覽器去抓 static/ 底下的檔案並自己快取，
+# 每次 rerun 只送幾個 <link>；沒開才退回內嵌，檔案也只在程序啟動時讀一次、編碼一次
+STATIC_URL = "app/static"
+
+@st.cache_resource
+def page_head_html():
+    static = st.get_option("server.enableStaticServing")
+    if static and os.path.exists("static/icon.png"): icon = f"{STATIC_URL}/icon.png"
+    elif os.path.exists("icon.png"):
+        with open("icon.png", "rb") as image_file:
+            icon = "data:image/png;base64," + base64.b64encode(image_file.read()).decode()
+    else: icon = None
+    if static: html = f'<link rel="stylesheet" href="{STATIC_URL}/style.css">'
+    else:
+        with open("static/style.css", encoding="utf-8") as css_file:
+            html = f"<style>{css_file.read()}</style>"
+    if icon: html += f'<link rel="apple-touch-icon" sizes="180x180" href="{icon}"><link rel="icon" type="image/png" href="{icon}">'
+    return html
+
+st.markdown(page_head_html(), unsafe_allow_html=True)
 
 # --- 初始化狀態 ---
 if "delete_verify_idx" not in st.session_state: st.session_state["delete_verify_idx"] = None
+if "saved_ids" not in st.session_state: st.session_state["saved_ids"] = []
+if "list_page" not in st.session_state: st.session_state["list_page"] = 0
+if "flash" not in st.session_state: st.session_state["flash"] = []
+timer = ActionTimer(st.session_state)
+
+# --- 💬 上一次操作留下的提示 (寫入後直接 rerun，不再 sleep 等 toast) ---
+def finish_action(action, message, balloons=False):
+    st.session_state["flash"].append((message, balloons))
+    timer.start(action)
+    st.rerun(scope="app")
+
+for message, balloons in st.session_state["flash"]:
+    st.toast(message)
+    if balloons: st.balloons()
+st.session_state["flash"] = []
 
 st.title("Everyday Moments")
 
@@ -154,86 +74,125 @@ if "current_quote" not in st.session_state:
     st.session_state["current_quote"] = random.choice(quotes)
 st.markdown(f'<div class="quote-box">{st.session_state["current_quote"]}</div>', unsafe_allow_html=True)
 
+# --- 🩺 效能紀錄 (secrets 設 [debug] profile = true 打開；profile_log 給路徑就另外寫 JSON lines) ---
+debug_settings = st.secrets.get("debug", {})
+profiler.configure(debug_settings.get("profile", False), debug_settings.get("profile_log"))
+
 # --- 連線 ---
-conn = st.connection("gsheets", type=GSheetsConnection)
+# 預設用本機 SQLite 當主資料庫，Google Sheet 由背景同步；secrets 設 [storage] backend = "sheets" 可改回直連
+@st.cache_resource
+def get_storage():
+    sheets = SheetsStorage(st.connection("gsheets", type=GSheetsConnection))
+    settings = st.secrets.get("storage", {})
+    if settings.get("backend", "sqlite") != "sqlite": return sheets
+    local = SQLiteStorage(settings.get("path", "data/ledger.sqlite"), remote=sheets)
+    local.bootstrap()
+    local.start_sync()
+    return local
+
+storage = get_storage()
+
+@st.cache_resource
+def get_coupons():
+    return CouponRepository(storage)
+
+coupons = get_coupons()
+
+# 月結歸檔 (預設關閉)：secrets 設 [archive] path = "data/archive" 後，上個月以前的紀錄會搬出 Google Sheet，
+# 存成本機 Parquet；歸檔資料夾要放在不會被清掉的磁碟上
+@st.cache_resource
+def get_archive():
+    path = st.secrets.get("archive", {}).get("path")
+    return MonthArchive(path) if path else None
+
+archive = get_archive()
+
+# 整理好的支出表跨 rerun / session 共用，只有資料變了才重算
+@st.cache_resource
+def get_ledger():
+    return ExpenseLedger(state_store=storage, archive=archive)
 
 # --- 讀取記帳資料 ---
+# 所有 session 共用同一份 ledger：過期或別處有新資料才讀，讀不到就先用手上的
+ledger = get_ledger()
 try:
-    df = conn.read(worksheet="Expenses", ttl=600)
-    if df.empty: df = pd.DataFrame(columns=["Date", "Category", "Amount", "Note"])
-    else:
-        df["Amount"] = pd.to_numeric(df["Amount"], errors="coerce").fillna(0)
-        df["Date_dt"] = pd.to_datetime(df["Date"], errors="coerce")
-        df["Month"] = df["Date_dt"].dt.strftime("%Y-%m")
-        df["Note"] = df["Note"].fillna("")
+    df = ledger.refresh(storage)
 except:
-    df = pd.DataFrame(columns=["Date", "Category", "Amount", "Note"])
+    df = ledger.frame
     st.toast("⚠️ 連線忙碌中，請稍後再試")
 
 taiwan_now = datetime.utcnow() + timedelta(hours=8)
 taiwan_date = taiwan_now.date()
 current_month_str = taiwan_now.strftime("%Y-%m")
 
-current_spent = df[df["Month"] == current_month_str]["Amount"].sum() if not df.empty else 0
-last_month_end = taiwan_date.replace(day=1) - timedelta(days=1)
-last_month_spent = df[df["Month"] == last_month_end.strftime("%Y-%m")]["Amount"].sum() if not df.empty else 0
+# --- 🗄️ 月結：每個程序每個月做一次，之後 Sheet 上只剩這個月 ---
+@st.cache_resource
+def rollover_closed_months(month):
+    moved = archive.rollover(storage, ledger.frame, month)
+    if moved: ledger.invalidate()
+    return moved
 
-# --- 🔥 連勝計算邏輯 ---
-def calculate_streak(df):
-    if df.empty: return 0
-    dates = df["Date_dt"].dt.date.dropna().unique()
-    dates.sort()
-    
-    if len(dates) == 0: return 0
-    
-    if dates[-1] != taiwan_date and dates[-1] != (taiwan_date - timedelta(days=1)):
-        return 0
-        
-    check_date = dates[-1]
-    streak = 1
-    
-    for i in range(len(dates)-2, -1, -1):
-        if dates[i] == check_date - timedelta(days=1):
-            streak += 1
-            check_date = dates[i]
-        else:
-            break
-    return streak
+if archive is not None:
+    try:
+        if rollover_closed_months(current_month_str): df = ledger.refresh(storage)
+    except Exception:
+        st.toast("⚠️ 月結歸檔失敗，下次開啟會再試")
+
+# 月結後這個月可能還沒有紀錄，但歸檔月份仍有資料可看
+has_data = not df.empty or bool(ledger.index.months())
+
+current_spent = ledger.index.month_total(current_month_str)
+last_month_end = taiwan_date.replace(day=1) - timedelta(days=1)
+last_month_spent = ledger.index.month_total(last_month_end.strftime("%Y-%m"))
 
-current_streak = calculate_streak(df)
+# --- 🔥 連勝 (ledger 每次新增/刪除時就更新好了) ---
+current_streak = ledger.streak.current_streak(taiwan_date)
 
 # --- 🏆 自動發獎系統 ---
 TARGET_STREAK = 21 
 ACHIEVEMENT_CODE = f"ACHIEVE_{TARGET_STREAK}DAYS" 
 
-try:
-    # 讀取 Coupons
-    coupon_df = conn.read(worksheet="Coupons", ttl=0)
-    if "Detail" not in coupon_df.columns: coupon_df["Detail"] = ""
-except:
-    coupon_df = pd.DataFrame(columns=["Code", "Prize", "Detail", "Status", "Date"])
+# Coupons 用到才讀 (有 TTL 快取，寫入後失效)
+def load_coupons():
+    try:
+        return coupons.load()
+    except:
+        return pd.DataFrame(columns=["Code", "Prize", "Detail", "Status", "Date"])
 
-# 檢查連勝發獎
-if current_streak >= TARGET_STREAK:
+# 檢查連勝發獎 (發過的獎記在連勝狀態裡，之後不用再查 Coupons)
+if current_streak >= TARGET_STREAK and ACHIEVEMENT_CODE not in ledger.streak.awarded:
+    coupon_df = load_coupons()
     if not coupon_df.empty:
-        coupon_df["Code"] = coupon_df["Code"].astype(str).str.strip()
         target_indices = coupon_df.index[coupon_df["Code"] == ACHIEVEMENT_CODE].tolist()
         
         if target_indices:
             idx = target_indices[0] 
             current_status = coupon_df.at[idx, "Status"]
+            if current_status != "待發送":
+                ledger.streak.awarded.add(ACHIEVEMENT_CODE)
+                ledger.save_streak()
             
-            if current_status == "待發送":
-                coupon_df.at[idx, "Status"] = "持有中" 
-                coupon_df.at[idx, "Date"] = taiwan_now.strftime("%Y-%m-%d %H:%M:%S")
-                conn.update(worksheet="Coupons", data=coupon_df)
+            if current_status == "待發送" and coupons.update_status(ACHIEVEMENT_CODE, "持有中", taiwan_now.strftime("%Y-%m-%d %H:%M:%S"), expected=["待發送"]):
+                ledger.streak.awarded.add(ACHIEVEMENT_CODE)
+                ledger.save_streak()
                 prize_name = coupon_df.at[idx, "Prize"]
-                st.balloons()
-                st.toast(f"🎉 恭喜達成 {TARGET_STREAK} 天連勝！\n獲得：{prize_name}")
-                time.sleep(2)
-                st.rerun()
+                finish_action("award", f"🎉 恭喜達成 {TARGET_STREAK} 天連勝！\n獲得：{prize_name}", balloons=True)
 
 # --- 側邊欄 ---
+# 換月份查詢只重跑這個 fragment
+@st.fragment
+def history_query():
+    if not has_data: return
+    month_options = ["🏆 歷史總花費"] + ledger.index.months()
+    selected_query = st.selectbox("選擇月份", month_options, label_visibility="collapsed")
+    if selected_query == "🏆 歷史總花費":
+        query_amount = ledger.index.total
+        query_label = "累積總支出"
+    else:
+        query_amount = ledger.index.month_total(selected_query)
+        query_label = f"{selected_query} 總支出"
+    st.info(f"{query_label}: **${query_amount:,.0f}**")
+
 with st.sidebar:
     st.header("⏳ 重要時刻")
     love_days = (taiwan_date - date(2019, 6, 15)).days
@@ -251,50 +210,59 @@ with st.sidebar:
     st.write("---")
     st.header("📊 帳務概況")
     st.metric(label="💸 本月已花費", value=f"${current_spent:,.0f}")
+
+    # ☁️ 背景同步狀態 (本機先記好，再批次送到 Google Sheet)
+    sync = storage.sync_status()
+    if sync is not None:
+        if sync["error"] is not None:
+            queued = f"，{sync['pending']} 筆暫存在本機" if sync["pending"] else ""
+            st.caption(f"📴 雲端連不上{queued}，{sync['retry_in']:.0f} 秒後重試")
+            if st.button("🔄 立即重試同步"): storage.request_sync()
+        elif sync["pending"] == 0: st.caption("☁️ 已同步到雲端")
+        else: st.caption(f"⏳ {sync['pending']} 筆同步中…")
     
     st.write("") 
     st.markdown("##### 📜 歷史查詢")
-    if not df.empty:
-        month_options = ["🏆 歷史總花費"] + sorted(df["Month"].dropna().unique().tolist(), reverse=True)
-        selected_query = st.selectbox("選擇月份", month_options, label_visibility="collapsed")
-        if selected_query == "🏆 歷史總花費":
-            query_amount = df["Amount"].sum()
-            query_label = "累積總支出"
-        else:
-            query_amount = df[df["Month"] == selected_query]["Amount"].sum()
-            query_label = f"{selected_query} 總支出"
-        st.info(f"{query_label}: **${query_amount:,.0f}**")
-    
-    st.write("---")
-    st.header("💰 錢包狀態")
-    monthly_budget = st.number_input("本月預算 (血量)", value=30000, step=1000)
+    history_query()
 
 # --- 🛡️ 錢包防禦戰 ---
-percent = current_spent / monthly_budget if monthly_budget > 0 else 0
-remaining = monthly_budget - current_spent
-_, last_day = calendar.monthrange(taiwan_date.year, taiwan_date.month)
-days_left = last_day - taiwan_date.day + 1
-daily_budget = remaining / days_left if days_left > 0 else 0
-
-st.subheader("🛡️ 錢包防禦戰")
-c_b1, c_b2, c_b3 = st.columns([2, 1, 1])
-with c_b1:
-    if percent < 0.3: status_text = "🏆 黃金理財大師"
-    elif percent < 0.6: status_text = "🛡️ 白銀防禦騎士"
-    elif percent < 0.9: status_text = "⚔️ 青銅奮戰勇者"
-    elif percent < 1.0: status_text = "🔴 紅色警戒兵"
-    else: status_text = "☠️ 骷髏錢包"
-    st.markdown(f'<div class="game-status">{status_text}</div>', unsafe_allow_html=True)
-    st.progress(min(percent, 1.0))
-with c_b2: st.metric("剩餘血量", f"${remaining:,.0f}")
-with c_b3: st.metric("📅 今日可用", f"${daily_budget:,.0f}")
+# 預算輸入跟血條放在同一個 fragment，改預算只重跑這一塊 (不重讀資料、不重畫分頁)
+@st.fragment
+def budget_panel():
+    st.subheader("🛡️ 錢包防禦戰")
+    monthly_budget = st.number_input("💰 本月預算 (血量)", value=30000, step=1000, key="monthly_budget")
+    percent = current_spent / monthly_budget if monthly_budget > 0 else 0
+    remaining = monthly_budget - current_spent
+    _, last_day = calendar.monthrange(taiwan_date.year, taiwan_date.month)
+    days_left = last_day - taiwan_date.day + 1
+    daily_budget = remaining / days_left if days_left > 0 else 0
+
+    c_b1, c_b2, c_b3 = st.columns([2, 1, 1])
+    with c_b1:
+        if percent < 0.3: status_text = "🏆 黃金理財大師"
+        elif percent < 0.6: status_text = "🛡️ 白銀防禦騎士"
+        elif percent < 0.9: status_text = "⚔️ 青銅奮戰勇者"
+        elif percent < 1.0: status_text = "🔴 紅色警戒兵"
+        else: status_text = "☠️ 骷髏錢包"
+        st.markdown(f'<div class="game-status">{status_text}</div>', unsafe_allow_html=True)
+        st.progress(min(percent, 1.0))
+    with c_b2: st.metric("剩餘血量", f"${remaining:,.0f}")
+    with c_b3: st.metric("📅 今日可用", f"${daily_budget:,.0f}")
+
+budget_panel()
 st.write("---")
 
 # === 主畫面分頁 ===
-tab1, tab2, tab3, tab4 = st.tabs(["📝 記帳", "📊 分析", "📋 列表", "🎒 背包"])
+# st.tabs 每次 rerun 四頁都會跑一遍；改成只畫選到的那一頁 (各頁寫成函式，最下面才呼叫)
+# 每一頁都是 fragment：頁內的輸入、翻頁、確認刪除只重跑那一頁，真的改了資料才由 finish_action 整頁 rerun
+VIEWS = ["📝 記帳", "📊 分析", "📋 列表", "🎒 背包"]
+view = st.segmented_control("分頁", VIEWS, default=VIEWS[0], key="view", label_visibility="collapsed") or VIEWS[0]
 
 # === Tab 1: 記帳 ===
-with tab1:
+@st.fragment
+@timed(st.session_state, "📝 記帳")
+def render_record():
+    timer.mark()
     st.markdown("### 😈 每一筆錢都要花得值得！")
     with st.form("entry_form", clear_on_submit=True):
         col1, col2 = st.columns(2)
@@ -308,87 +276,188 @@ with tab1:
         if submitted:
             if amount_val > 0:
                 try:
-                    raw_df = conn.read(worksheet="Expenses", ttl=0)
-                    if raw_df.empty: raw_df = pd.DataFrame(columns=["Date", "Category", "Amount", "Note"])
-                    new_row = pd.DataFrame([{
+                    new_rows = [{
+                        "ID": new_expense_id(),
                         "Date": f"{date_val} {taiwan_now.strftime('%H:%M:%S')}", 
                         "Category": cat_val, 
                         "Amount": amount_val, 
                         "Note": note_val
-                    }])
-                    final_df = pd.concat([raw_df, new_row], ignore_index=True)
-                    if "User" in final_df.columns: final_df = final_df.drop(columns=["User"])
-                    conn.update(worksheet="Expenses", data=final_df)
-                    st.toast("✨ 恭喜啦~離成功又更近一步！")
-                    conn.reset()
-                    time.sleep(1); st.rerun()
+                    }]
+                    storage.append_expenses(new_rows)
+                    ledger.append(new_rows)
+                    st.session_state["saved_ids"].append(new_rows[0]["ID"])
                 except Exception as e: st.error(f"錯誤：{e}")
+                else: finish_action("save", "✨ 恭喜啦~離成功又更近一步！")
 
     with st.expander("記錯帳按這邊 (快速復原)", expanded=False):
         st.markdown('<div class="del-btn">', unsafe_allow_html=True)
         if st.button("↩️ 刪除最後一筆紀錄 (Undo)"):
             try:
-                raw_df = conn.read(worksheet="Expenses", ttl=0)
-                if not raw_df.empty:
-                    conn.update(worksheet="Expenses", data=raw_df.iloc[:-1])
-                    st.toast("已刪除最後一筆紀錄")
-                    conn.reset()
-                    time.sleep(1); st.rerun()
-                else: st.warning("無紀錄可刪")
+                # 優先撤銷自己這次記的最後一筆，沒有才刪整本帳的最後一筆
+                saved_ids = st.session_state["saved_ids"]
+                frame = ledger.snapshot()[0]
+                last_id = saved_ids[-1] if saved_ids else (frame.index[-1] if not frame.empty else None)
+                deleted = last_id is not None and storage.delete_expense(last_id)
+                # 刪除失敗 (例外) 時 ID 還留著，下次 Undo 還能再試；回傳 False 表示表上已經沒有這筆，也一起拿掉
+                if saved_ids and saved_ids[-1] == last_id: saved_ids.pop()
+                if deleted:
+                    ledger.remove(last_id)
             except Exception as e: st.error(f"刪除失敗: {e}")
+            else:
+                if deleted: finish_action("undo", "已刪除最後一筆紀錄")
+                else: st.warning("無紀錄可刪")
         st.markdown('</div>', unsafe_allow_html=True)
 
+    # 📥 批次匯入 / 📤 匯出：補記歷史或從別的 App 搬家，整份 CSV 驗證去重後一次寫入
+    with st.expander("📥 匯入 / 📤 匯出 CSV", expanded=False):
+        st.caption("欄位：Date, Category, Amount, Note (也認得 日期/分類/金額/備註)；同一天、同金額、同備註已經記過的會略過")
+        upload = st.file_uploader("選擇 CSV 檔", type="csv", key="import_file", label_visibility="collapsed")
+        if upload is not None and st.button("📥 開始匯入"):
+            try:
+                new_df, report = prepare_import(upload, ledger.snapshot()[0], archive)
+                if not new_df.empty:
+                    storage.append_expenses(new_df)
+                    ledger.append(new_df)
+            except ValueError as e: st.error(f"檔案格式不對：{e}")
+            except Exception as e:
+                # 寫到一半失敗時表上可能已有部分資料，下次整個重讀；再匯入一次會自動略過已寫入的
+                ledger.invalidate()
+                st.error(f"匯入失敗：{e}")
+            else:
+                message = f"📥 匯入 {report['imported']:,} 筆，略過重複 {report['duplicates']:,} 筆"
+                if report["invalid"]:
+                    lines = "、".join(str(line) for line, _ in report["errors"][:5]) + ("…" if report["invalid"] > 5 else "")
+                    message += f"，格式錯誤 {report['invalid']:,} 筆 (第 {lines} 行)"
+                finish_action("import", message)
+        # 按下才產生檔案 (在另一個執行緒跑，不擋畫面)
+        st.download_button("📤 匯出全部紀錄", data=lambda: export_csv(ledger.frame, archive), file_name=f"expenses_{taiwan_date}.csv",
+                           mime="text/csv", on_click="ignore")
+
 # === Tab 2: 分析 ===
-with tab2:
-    if not df.empty:
-        selected_month = st.selectbox("🗓️ 選擇月份", ["全部"] + sorted(df["Month"].dropna().unique(), reverse=True))
-        plot_df = df if selected_month == "全部" else df[df["Month"] == selected_month]
-        st.metric(f"總支出", f"${plot_df['Amount'].sum():,.0f}")
-        if not plot_df.empty:
-            fig = px.pie(plot_df.groupby("Category")["Amount"].sum().reset_index(), values="Amount", names="Category", hole=0.4)
-            st.plotly_chart(fig, use_container_width=True)
+# 圓餅圖依 (資料版本, 月份) 快取，資料沒變、月份沒換就不重建 figure
+@st.cache_resource(max_entries=32)
+def pie_figure(_index, version, month):
+    pie_df = _index.category_frame(month)
+    if pie_df.empty: return None
+    return px.pie(pie_df, values="Amount", names="Category", hole=0.4)
+
+@st.fragment
+@timed(st.session_state, "📊 分析")
+def render_analysis():
+    if has_data:
+        selected_month = st.selectbox("🗓️ 選擇月份", ["全部"] + ledger.index.months())
+        month = None if selected_month == "全部" else selected_month
+        month_total = ledger.index.total if month is None else ledger.index.month_total(month)
+        st.metric(f"總支出", f"${month_total:,.0f}")
+        fig = pie_figure(ledger.index, ledger.version, month)
+        if fig is not None: st.plotly_chart(fig, use_container_width=True)
     else: st.info("尚無資料")
 
 # === Tab 3: 列表 ===
-with tab3:
+LIST_PAGE_SIZE = 20
+
+def reset_list_page():
+    st.session_state["list_page"] = 0
+    st.session_state["delete_verify_idx"] = None
+
+# 翻頁、進入/取消刪除確認都用 on_click 改狀態，按鈕所在的 fragment 自己重跑就會畫出新狀態
+def set_list_state(key, value):
+    st.session_state[key] = value
+
+# 歸檔月份的明細用到才讀 (再加上月結後才補記、還在 Sheet 上的那幾筆)，新到舊排好
+@st.cache_resource(max_entries=4)
+def archived_month_frame(_frame, month, version):
+    live = _frame[_frame["Month"] == month].reset_index()
+    rows = pd.concat([archive.load_month(month), live[["Date", "Category", "Amount", "Note", "ID"]]], ignore_index=True)
+    rows["Date_dt"] = parse_dates(rows["Date"])
+    return rows.sort_values("Date_dt", ascending=False, kind="stable").set_index("ID")
+
+@st.fragment
+@timed(st.session_state, "📋 列表")
+def render_list():
+    timer.mark()
     st.subheader("📋 最近紀錄")
-    if not df.empty:
-        df_display = df.copy()
-        df_display['orig_idx'] = df_display.index
-        df_display = df_display.sort_values("Date", ascending=False).head(20)
-        for _, row in df_display.iterrows():
-            with st.container(border=True):
-                c1, c2, c3 = st.columns([3, 1.5, 1.1])
-                with c1:
-                    st.markdown(f'<div class="card-title">{row["Category"]}</div>', unsafe_allow_html=True)
-                    st.markdown(f'<div class="card-note">{row["Date"]} | {row["Note"]}</div>', unsafe_allow_html=True)
-                with c2: st.markdown(f'<div class="card-amount">${row["Amount"]:,.0f}</div>', unsafe_allow_html=True)
-                with c3:
-                    if st.session_state["delete_verify_idx"] == row['orig_idx']:
-                        sub_c1, sub_c2 = st.columns(2)
-                        with sub_c1:
-                            if st.button("✅", key=f"conf_{row['orig_idx']}", type="primary"):
-                                try:
-                                    fresh_df = conn.read(worksheet="Expenses", ttl=0)
-                                    conn.update(worksheet="Expenses", data=fresh_df.drop(row['orig_idx']))
-                                    st.toast("🗑️ 已成功刪除")
-                                    st.session_state["delete_verify_idx"] = None
-                                    conn.reset()
-                                    time.sleep(1); st.rerun()
-                                except Exception as e: st.error(f"失敗：{e}")
-                        with sub_c2:
-                            if st.button("❌", key=f"cancel_{row['orig_idx']}"):
+    # 別的 session 可能同時在記帳：frame 與 recent 一起取一份，這次 rerun 都用同一份
+    frame, recent, version = ledger.snapshot()
+    if has_data:
+        f1, f2 = st.columns(2)
+        with f1: list_month = st.selectbox("🗓️ 月份", ["全部"] + ledger.index.months(), key="list_month", on_change=reset_list_page)
+        categories = recent.categories()
+        if archive is not None: categories = sorted(set(categories) | set(archive.totals()["Category"]))
+        with f2: list_cat = st.selectbox("📂 分類", ["全部"] + categories, key="list_cat", on_change=reset_list_page)
+        month_filter = None if list_month == "全部" else list_month
+        cat_filter = None if list_cat == "全部" else list_cat
+
+        if archive is not None and month_filter in archive.months():
+            rows = archived_month_frame(frame, month_filter, version)
+            if cat_filter is not None: rows = rows[rows["Category"] == cat_filter]
+            total = len(rows)
+            pages = max((total - 1) // LIST_PAGE_SIZE + 1, 1)
+            page = min(st.session_state["list_page"], pages - 1)
+            page_df = rows.iloc[page * LIST_PAGE_SIZE:(page + 1) * LIST_PAGE_SIZE]
+        else:
+            # 依日期排好的索引直接切出這一頁，不必整表排序
+            _, total = recent.page(0, 0, month_filter, cat_filter)
+            pages = max((total - 1) // LIST_PAGE_SIZE + 1, 1)
+            page = min(st.session_state["list_page"], pages - 1)
+            page_ids, _ = recent.page(page * LIST_PAGE_SIZE, LIST_PAGE_SIZE, month_filter, cat_filter)
+            page_df = frame.loc[page_ids]
+            if month_filter is None and archive is not None and archive.months(): st.caption("🗄️ 更早的月份已歸檔，選擇月份就能看明細")
+
+        # 一整頁的卡片合成一個 HTML 區塊
+        cards = "".join(
+            f'<div class="expense-card"><div><div class="card-title">{escape(str(row.Category))}</div>'
+            f'<div class="card-note">{escape(str(row.Date))} | {escape(str(row.Note))}</div></div>'
+            f'<div class="card-amount">${row.Amount:,.0f}</div></div>'
+            for row in page_df.itertuples()
+        )
+        st.markdown(cards or '<div class="card-note">這個條件下沒有紀錄</div>', unsafe_allow_html=True)
+
+        p1, p2, p3 = st.columns([1, 1.2, 1])
+        with p1:
+            st.button("⬅️ 上一頁", disabled=page == 0, on_click=set_list_state, args=("list_page", page - 1))
+        with p2: st.markdown(f'<div class="page-info">{page + 1} / {pages} 頁 (共 {total} 筆)</div>', unsafe_allow_html=True)
+        with p3:
+            st.button("下一頁 ➡️", disabled=page >= pages - 1, on_click=set_list_state, args=("list_page", page + 1))
+
+        # 整頁只放一組刪除控制 (已歸檔的紀錄不能刪)
+        page_ids = [expense_id for expense_id in page_df.index if expense_id in frame.index]
+        if page_ids:
+            with st.expander("🗑️ 刪除這頁的一筆紀錄", expanded=st.session_state["delete_verify_idx"] is not None):
+                # selectbox 以顯示文字對應選項，同一秒記的相同內容要加編號區分，不然會選到別筆
+                labels, seen = {}, {}
+                for expense_id, row in zip(page_ids, frame.loc[page_ids].itertuples()):
+                    label = f"{row.Date} {row.Category} ${row.Amount:,.0f}"
+                    seen[label] = seen.get(label, 0) + 1
+                    labels[expense_id] = label if seen[label] == 1 else f"{label} ({seen[label]})"
+                target_id = st.selectbox("選擇紀錄", page_ids, format_func=labels.get, label_visibility="collapsed")
+                if st.session_state["delete_verify_idx"] == target_id:
+                    sub_c1, sub_c2 = st.columns(2)
+                    with sub_c1:
+                        if st.button("✅ 確認刪除", key="conf_delete", type="primary"):
+                            try:
+                                deleted = storage.delete_expense(target_id)
                                 st.session_state["delete_verify_idx"] = None
-                                st.rerun()
-                    else:
-                        if st.button("🗑️", key=f"del_{row['orig_idx']}"):
-                            st.session_state["delete_verify_idx"] = row['orig_idx']
-                            st.rerun()
+                                # 表上找不到這筆 (別處已刪掉) 就整個重讀，不假裝刪成功
+                                if deleted: ledger.remove(target_id)
+                                else: ledger.invalidate()
+                            except Exception as e: st.error(f"失敗：{e}")
+                            else:
+                                if deleted: finish_action("delete", "🗑️ 已成功刪除")
+                                else: finish_action("delete", "⚠️ 找不到這筆紀錄，可能已經被刪掉了，已重新整理")
+                    with sub_c2:
+                        st.button("❌ 取消", key="cancel_delete", on_click=set_list_state, args=("delete_verify_idx", None))
+                else:
+                    st.button("🗑️ 刪除", key="del_expense", on_click=set_list_state, args=("delete_verify_idx", target_id))
     else: st.info("尚無資料")
 
 # === Tab 4: 背包 (完整版) ===
-with tab4:
+@st.fragment
+@timed(st.session_state, "🎒 背包")
+def render_backpack():
+    timer.mark()
     st.subheader("🎒 我的背包")
+    coupon_df = load_coupons()
     
     # 1. 兌換輸入區
     with st.expander("➕ 輸入代碼領取獎品", expanded=False):
@@ -397,7 +466,6 @@ with tab4:
         if st.button("🎁 領取"):
             if coupon_code:
                 if not coupon_df.empty:
-                    coupon_df["Code"] = coupon_df["Code"].astype(str).str.strip()
                     input_code = coupon_code.strip()
                     target_row = coupon_df[coupon_df["Code"] == input_code]
                     
@@ -406,13 +474,9 @@ with tab4:
                         current_status = target_row.at[idx, "Status"]
                         if current_status in ["未使用", "待發送"]:
                             prize = target_row.at[idx, "Prize"]
-                            coupon_df.at[idx, "Status"] = "持有中"
-                            coupon_df.at[idx, "Date"] = taiwan_now.strftime("%Y-%m-%d %H:%M:%S")
-                            conn.update(worksheet="Coupons", data=coupon_df)
-                            st.balloons()
-                            st.toast(f"🎒 成功放入背包：{prize}")
-                            conn.reset()
-                            time.sleep(1); st.rerun()
+                            if coupons.update_status(input_code, "持有中", taiwan_now.strftime("%Y-%m-%d %H:%M:%S"), expected=["未使用", "待發送"]):
+                                finish_action("redeem", f"🎒 成功放入背包：{prize}", balloons=True)
+                            else: st.warning("⚠️ 這張券剛剛已經被領走囉！")
                         elif current_status == "持有中":
                             st.warning("🎒 已經在背包裡囉！")
                         else:
@@ -438,13 +502,9 @@ with tab4:
                     with c2:
                         st.markdown('<div class="use-btn">', unsafe_allow_html=True)
                         if st.button("✨ 使用", key=f"use_btn_{i}"):
-                            coupon_df.at[i, "Status"] = "已使用"
-                            coupon_df.at[i, "Date"] = taiwan_now.strftime("%Y-%m-%d %H:%M:%S")
-                            conn.update(worksheet="Coupons", data=coupon_df)
-                            st.toast(f"✅ 已使用：{row['Prize']}")
-                            st.balloons()
-                            conn.reset()
-                            time.sleep(1); st.rerun()
+                            if coupons.update_status(row["Code"], "已使用", taiwan_now.strftime("%Y-%m-%d %H:%M:%S"), expected=["持有中"]):
+                                finish_action("use", f"✅ 已使用：{row['Prize']}", balloons=True)
+                            else: finish_action("use", "⚠️ 這張券已經被使用過囉")
                         st.markdown('</div>', unsafe_allow_html=True)
                     
                     detail_content = str(row['Detail'])
@@ -478,8 +538,21 @@ with tab4:
 
 # --- Footer ---
 st.write("---")
+# === 只畫選到的那一頁 ===
+renderers = dict(zip(VIEWS, [render_record, render_analysis, render_list, render_backpack]))
+renderers[view]()
+
 st.markdown("""
     <div class="footer">
         作者 <a href="https://line.me/ti/p/OSubE3tsH4" target="_blank" style="text-decoration:none; color:#cccccc;">LunGo.</a>
     </div>
 """, unsafe_allow_html=True)
+
+# --- ⏱️ 上一個操作從按下到畫面更新完的時間 ---
+timer.finish()
+profiler.record("rerun", (time.perf_counter() - RUN_STARTED) * 1000)
+
+if profiler.enabled:
+    with st.sidebar.expander("🩺 效能紀錄 (最近 200 次)"):
+        st.dataframe(profiler.summary().round(1), hide_index=True)
+        if st.button("清除紀錄"): profiler.clear()
@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+
+import pandas as pd
+
+from perf import profiler
+from storage import parse_dates
+
+RAW_COLUMNS = ["Date", "Category", "Amount", "Note", "ID"]
+
+
+# --- 🗄️ 已結束月份的本機歸檔 (Parquet，依 Month 分區) ---
+class MonthArchive:
+    """上個月以前的紀錄搬到 root/Month=YYYY-MM/part.parquet，另存月×分類總額與每日筆數；明細用到才讀。"""
+
+    def __init__(self, root="data/archive"):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._totals = self._read_table("totals", {"Month": str, "Category": str, "Amount": float, "Count": int})
+        self._days = self._read_table("days", {"Day": str, "Count": int})
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def _read_table(self, name, dtypes):
+        path = self._path(f"{name}.parquet")
+        if not os.path.exists(path): return pd.DataFrame({col: pd.Series(dtype=t) for col, t in dtypes.items()})
+        return pd.read_parquet(path)
+
+    def _write(self, df, path):
+        # 先寫暫存檔再換名，寫到一半當掉也不會留下壞檔
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+
+    def _month_path(self, month):
+        return self._path(os.path.join(f"Month={month}", "part.parquet"))
+
+    # --- 讀取 ---
+    def months(self):
+        return sorted(self._totals["Month"].unique(), reverse=True)
+
+    def totals(self):
+        return self._totals.copy()
+
+    def day_counts(self):
+        return {pd.Timestamp(day).date(): int(n) for day, n in zip(self._days["Day"], self._days["Count"])}
+
+    def load_month(self, month):
+        path = self._month_path(month)
+        if not os.path.exists(path): return pd.DataFrame(columns=RAW_COLUMNS)
+        with profiler.span("archive.load_month", month=month) as span:
+            df = pd.read_parquet(path)
+            span["rows"] = len(df)
+        return df
+
+    # --- 月結 ---
+    def pending_ids(self):
+        # 歸檔寫好、但還沒從 Google Sheet 刪掉的 ID (刪除失敗時下次補刪，讀資料時也先排除)
+        try:
+            with open(self._path("pending.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _set_pending(self, ids):
+        with open(self._path("pending.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump([str(i) for i in ids], f)
+        os.replace(self._path("pending.json.tmp"), self._path("pending.json"))
+
+    def exclude_pending(self, raw):
+        pending = self.pending_ids()
+        if not pending or "ID" not in raw.columns: return raw
+        return raw[~raw["ID"].astype(str).isin(pending)].reset_index(drop=True)
+
+    def _write_month(self, month, rows):
+        # 同一個月再歸檔 (補記的舊帳、上次做到一半) 時跟原本的合併，以 ID 去重
+        merged = pd.concat([self.load_month(month), rows[RAW_COLUMNS]], ignore_index=True)
+        merged = merged.drop_duplicates("ID", keep="last").sort_values("Date", kind="stable")
+        self._write(merged.reset_index(drop=True), self._month_path(month))
+        amounts = pd.to_numeric(merged["Amount"], errors="coerce").fillna(0)
+        totals = amounts.groupby(merged["Category"]).agg(["sum", "count"]).reset_index()
+        totals.columns = ["Category", "Amount", "Count"]
+        totals.insert(0, "Month", month)
+        days = parse_dates(merged["Date"]).dropna().dt.strftime("%Y-%m-%d").value_counts()
+        days = days.rename_axis("Day").reset_index(name="Count")
+        self._totals = pd.concat([self._totals[self._totals["Month"] != month], totals], ignore_index=True)
+        self._days = pd.concat([self._days[self._days["Day"].str[:7] != month], days], ignore_index=True)
+
+    def rollover(self, storage, frame, open_month):
+        """把 open_month 以前的月份從 storage 搬進歸檔；frame 是 ledger 整理好的支出表 (index 是 ID)。"""
+        with self._lock, profiler.span("archive.rollover") as span:
+            pending = self.pending_ids()
+            if pending:
+                storage.delete_expenses(pending)
+                self._set_pending([])
+            months = frame["Month"].astype(object)
+            closed = frame[months.notna() & (months.astype(str) < open_month) & ~frame.index.isin(pending)]
+            span["rows"] = len(closed)
+            if closed.empty: return len(pending)
+            raw = closed.reset_index()[RAW_COLUMNS]
+            for month, rows in raw.groupby(closed["Month"].astype(str).values):
+                self._write_month(month, rows)
+            self._write(self._totals, self._path("totals.parquet"))
+            self._write(self._days, self._path("days.parquet"))
+            self._set_pending(raw["ID"].tolist())
+            storage.delete_expenses(raw["ID"].tolist())
+            self._set_pending([])
+            return len(pending) + len(closed)
@@ -0,0 +1,49 @@
+"""用 streamlit AppTest 跑 app.py，Google Sheet 換成 FakeGSheetsConnection。"""
+import os
+import tempfile
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# AppTest 會把 _script 的原始碼另存成檔案執行，只能透過模組變數把假連線傳進去
+connection = None
+
+
+def _script():
+    import runpy
+
+    import streamlit as st
+
+    from benchmarks import app_harness
+
+    st.connection = lambda *args, **kwargs: app_harness.connection
+    runpy.run_path(app_harness.APP_PATH, run_name="__main__")
+
+
+def make_app_test(conn, backend="sqlite", timeout=60, path=None, fresh=True):
+    # fresh=False：沿用同一個程序裡的 cache_resource，模擬多個 session 連到同一個 server
+    global connection
+    connection = conn
+    if fresh:
+        st.cache_resource.clear()
+        st.cache_data.clear()
+    at = AppTest.from_function(_script, default_timeout=timeout)
+    at.secrets["storage"] = {"backend": backend, "path": path or os.path.join(tempfile.mkdtemp(), "ledger.sqlite")}
+    return at
+
+
+def element_bytes(at):
+    # 每個元素 protobuf 的大小，約等於這次 rerun 經 websocket 送出的 delta
+    sizes = []
+
+    def walk(node):
+        children = getattr(node, "children", None)
+        if children:
+            for child in children.values(): walk(child)
+        elif getattr(node, "proto", None) is not None:
+            sizes.append((node.type, node.proto.ByteSize()))
+
+    walk(at._tree)
+    return sizes
@@ -0,0 +1,90 @@
+"""用 AppTest 跑整支 app.py，量冷啟動、一般 rerun、記帳、刪除、兌換的延遲。
+
+    python -m benchmarks.bench_app --sizes 1000,10000,100000 --rtt-ms 80
+    python -m benchmarks.bench_app --csv data/synthetic      # 用 synthetic.py 產生的 CSV
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.app_harness import make_app_test
+from benchmarks.fake_gsheets import FakeGSheetsConnection
+from benchmarks.synthetic import make_connection
+
+
+def timed_run(at):
+    start = time.perf_counter()
+    at.run()
+    if at.exception: raise RuntimeError(at.exception[0].value)
+    return (time.perf_counter() - start) * 1000
+
+
+def button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+def bench(conn, backend, repeat):
+    result = {}
+    at = make_app_test(conn, backend=backend, timeout=300)
+    result["cold"] = timed_run(at)
+    result["rerun"] = statistics.median(timed_run(at) for _ in range(repeat))
+
+    saves = []
+    for _ in range(repeat):
+        next(n for n in at.number_input if n.label == "💲 金額").set_value(120)
+        button(at, "💾 確認儲存").click()
+        saves.append(timed_run(at))
+    result["save"] = statistics.median(saves)
+
+    at.session_state["view"] = "📋 列表"
+    at.run()
+    deletes = []
+    for _ in range(repeat):
+        button(at, "🗑️ 刪除").click()
+        at.run()
+        button(at, "✅ 確認刪除").click()
+        deletes.append(timed_run(at))
+    result["delete"] = statistics.median(deletes)
+
+    at.session_state["view"] = "🎒 背包"
+    at.run()
+    codes = conn.client.worksheets["Coupons"]._rows
+    unused = [row[0] for row in codes[1:] if row[3] == "未使用"][:repeat]
+    redeems = []
+    for code in unused:
+        at.text_input(key="coupon_input").set_value(code)
+        button(at, "🎁 領取").click()
+        redeems.append(timed_run(at))
+    result["redeem"] = statistics.median(redeems) if redeems else float("nan")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--csv", help="改用這個資料夾裡的 Expenses.csv / Coupons.csv")
+    parser.add_argument("--backend", choices=["sheets", "sqlite"], default="sheets")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    parser.add_argument("--kbps", type=float, default=0, help="模擬頻寬 (KB/s)，0 表示不限速")
+    args = parser.parse_args()
+
+    latency = dict(rtt=args.rtt_ms / 1000, bytes_per_sec=args.kbps * 1024 or None)
+    if args.csv:
+        conn = FakeGSheetsConnection.from_csv(args.csv, **latency)
+        datasets = [(len(conn.client.worksheets["Expenses"]._rows) - 1, conn)]
+    else:
+        datasets = [(n, make_connection(n, **latency)) for n in map(int, args.sizes.split(","))]
+
+    # 先用小資料跑一次，讓 plotly 等模組的第一次 import 不算進第一組的冷啟動
+    bench(make_connection(100), args.backend, 1)
+    steps = ["cold", "rerun", "save", "delete", "redeem"]
+    print(f"backend={args.backend} rtt={args.rtt_ms:g}ms, median of {args.repeat} (ms)")
+    print(f"{'rows':>8}" + "".join(f"{step:>10}" for step in steps))
+    for n, conn in datasets:
+        result = bench(conn, args.backend, args.repeat)
+        print(f"{n:>8}" + "".join(f"{result[step]:>10.1f}" for step in steps))
+
+
+if __name__ == "__main__":
+    main()
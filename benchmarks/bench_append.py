@@ -0,0 +1,84 @@
+"""新增一筆支出的延遲：舊的「整表讀回 + 整表覆寫」vs. SheetsStorage.append_expenses。
+
+    python -m benchmarks.bench_append --rtt-ms 80 --kbps 1000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from benchmarks.fake_gsheets import FakeGSheetsConnection, FakeWorksheet
+from storage import EXPENSE_COLUMNS, SheetsStorage
+
+CATEGORIES = ["🍔 飲食 (三餐/飲料)", "🛒 日用 (超市/藥妝)", "🚗 交通 (車票/加油)", "🏠 居家 (房貸/水電)", "💸 其他"]
+
+
+def make_rows(n):
+    start = datetime(2020, 1, 1)
+    return [[
+        (start + timedelta(minutes=37 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+        random.choice(CATEGORIES),
+        random.randrange(10, 3000, 10),
+        random.choice(["", "午餐", "全聯", "加油"]),
+        f"{i:012x}",
+    ] for i in range(n)]
+
+
+def new_row():
+    return {"Date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Category": CATEGORIES[0], "Amount": 120, "Note": "bench"}
+
+
+def save_rewrite(conn):
+    raw_df = conn.read(worksheet="Expenses", ttl=0)
+    final_df = pd.concat([raw_df, pd.DataFrame([new_row()])], ignore_index=True)
+    conn.update(worksheet="Expenses", data=final_df)
+
+
+def save_append(storage):
+    storage.append_expenses([new_row()])
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    parser.add_argument("--kbps", type=float, default=0, help="模擬頻寬 (KB/s)，0 表示不限速")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} | {'rewrite ms':>11} | {'append ms':>10} | {'rewrite KB':>10} | {'append KB':>9} | {'opens':>5}")
+    for n in [int(s) for s in args.sizes.split(",")]:
+        base = [EXPENSE_COLUMNS] + make_rows(n)
+        opts = dict(rtt=args.rtt_ms / 1000, bytes_per_sec=args.kbps * 1024 or None)
+
+        ws = FakeWorksheet("Expenses", base, **opts)
+        conn = FakeGSheetsConnection([ws])
+        rewrite_ms = measure(lambda: save_rewrite(conn), args.repeat)
+        rewrite_kb = ws.bytes_sent / args.repeat / 1024
+
+        ws = FakeWorksheet("Expenses", base, **opts)
+        storage = SheetsStorage(FakeGSheetsConnection([ws]))
+        storage.append_expenses([new_row()])  # 先開好分頁、讀好表頭
+        ws.bytes_sent, storage.conn.client.opens = 0, 0
+        append_ms = measure(lambda: save_append(storage), args.repeat)
+        append_kb = ws.bytes_sent / args.repeat / 1024
+        # 量測期間重開分頁的次數 (應該是 0；有的話每次多兩個往返)
+        opens = storage.conn.client.opens
+
+        print(f"{n:>8} | {rewrite_ms:>11.1f} | {append_ms:>10.2f} | {rewrite_kb:>10.1f} | {append_kb:>9.2f} | {opens:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""批次匯入 / 匯出 CSV 的時間：整理 + 去重、寫進 Sheet、套用到 ledger、再整份匯出。
+
+    python -m benchmarks.bench_bulk --existing 10000 --rows 100000
+"""
+import argparse
+import io
+import time
+
+import pandas as pd
+
+from benchmarks.fake_gsheets import FakeGSheetsConnection, FakeWorksheet
+from benchmarks.synthetic import generate_expenses
+from bulk import export_csv, prepare_import
+from ledger import ExpenseLedger
+from storage import EXPENSE_COLUMNS, SheetsStorage
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--existing", type=int, default=10000)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    existing = generate_expenses(args.existing, seed=1)
+    conn = FakeGSheetsConnection([FakeWorksheet("Expenses", [EXPENSE_COLUMNS] + existing)])
+    storage = SheetsStorage(conn)
+    ledger = ExpenseLedger()
+    ledger.load(pd.DataFrame(existing, columns=EXPENSE_COLUMNS))
+    # 模擬別的 App 匯出的檔案：中文欄位、只有日期、金額帶 $
+    other = pd.DataFrame(generate_expenses(args.rows, seed=2), columns=EXPENSE_COLUMNS)
+    csv = pd.DataFrame({"日期": other["Date"].str[:10], "分類": other["Category"],
+                        "金額": "$" + other["Amount"].astype(str), "備註": other["Note"]}).to_csv(index=False).encode()
+
+    steps = {}
+    start = time.perf_counter()
+    new, report = prepare_import(io.BytesIO(csv), ledger.frame)
+    steps["prepare"] = time.perf_counter() - start
+    start = time.perf_counter()
+    storage.append_expenses(new)
+    steps["append"] = time.perf_counter() - start
+    start = time.perf_counter()
+    ledger.append(new)
+    steps["ledger"] = time.perf_counter() - start
+    start = time.perf_counter()
+    with export_csv(ledger.frame) as out:
+        steps["export"] = time.perf_counter() - start
+        size = out.seek(0, 2)
+
+    print(f"{args.rows} rows into {args.existing}: imported {report['imported']}, duplicates {report['duplicates']}, "
+          f"invalid {report['invalid']}, export {size / 2 ** 20:.1f} MB")
+    for step, seconds in steps.items(): print(f"{step:<8}{seconds * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
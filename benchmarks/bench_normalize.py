@@ -0,0 +1,67 @@
+"""支出表整理的耗時：舊的逐 rerun 全表整理 vs. ExpenseLedger (冷啟動 / 沒變 / 尾端新增)。
+
+    python -m benchmarks.bench_normalize --rows 200000
+"""
+import argparse
+import copy
+import statistics
+import time
+
+import pandas as pd
+
+from benchmarks.bench_append import make_rows
+from ledger import ExpenseLedger
+from storage import EXPENSE_COLUMNS
+
+
+def normalize_inline(df):
+    # 原本 app.py 每次 rerun 做的事
+    df = df.copy()
+    df["Amount"] = pd.to_numeric(df["Amount"], errors="coerce").fillna(0)
+    df["Date_dt"] = pd.to_datetime(df["Date"], errors="coerce")
+    df["Month"] = df["Date_dt"].dt.strftime("%Y-%m")
+    df["Note"] = df["Note"].fillna("")
+    return df
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        # fn 回傳秒數時只計它自己量的那段 (扣掉準備工作)
+        t0 = time.perf_counter()
+        elapsed = fn()
+        samples.append(elapsed if isinstance(elapsed, float) else time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    raw = pd.DataFrame(make_rows(args.rows), columns=EXPENSE_COLUMNS)
+    grown = pd.concat([raw, pd.DataFrame(make_rows(10), columns=EXPENSE_COLUMNS)], ignore_index=True)
+
+    def cold():
+        ExpenseLedger().load(raw)
+
+    warm_ledger = ExpenseLedger()
+    warm_ledger.load(raw)
+
+    def append():
+        ledger = copy.copy(warm_ledger)
+        ledger.index, ledger.streak = copy.deepcopy(warm_ledger.index), copy.deepcopy(warm_ledger.streak)
+        t0 = time.perf_counter()
+        ledger.load(grown)
+        return time.perf_counter() - t0
+
+    print(f"rows = {args.rows:,}")
+    print(f"  inline (每次 rerun 全表)   {measure(lambda: normalize_inline(raw), args.repeat):9.1f} ms")
+    print(f"  ledger 冷啟動              {measure(cold, args.repeat):9.1f} ms")
+    print(f"  ledger 資料沒變            {measure(lambda: warm_ledger.load(raw), args.repeat):9.2f} ms")
+    print(f"  ledger 尾端新增 10 列      {measure(append, args.repeat):9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""每次 rerun 送到瀏覽器的元素大小 (protobuf bytes)，依元素類型加總。
+
+    python -m benchmarks.bench_payload
+"""
+import argparse
+from collections import Counter
+
+from benchmarks.app_harness import element_bytes, make_app_test
+from benchmarks.bench_append import make_rows
+from benchmarks.fake_gsheets import FakeGSheetsConnection, FakeWorksheet
+from storage import COUPON_COLUMNS, EXPENSE_COLUMNS
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    conn = FakeGSheetsConnection([
+        FakeWorksheet("Expenses", [EXPENSE_COLUMNS] + make_rows(args.rows)),
+        FakeWorksheet("Coupons", [COUPON_COLUMNS]),
+    ])
+    at = make_app_test(conn)
+    at.run()
+    at.run()  # 第二次才是一般 rerun (快取都暖好了)
+    sizes = element_bytes(at)
+    by_type = Counter()
+    for kind, size in sizes: by_type[kind] += size
+    print(f"{len(sizes)} elements, {sum(by_type.values()):,} bytes per rerun")
+    for kind, size in by_type.most_common(args.top):
+        print(f"  {kind:<16}{size:>10,} B")
+    largest = max(sizes, key=lambda item: item[1])
+    print(f"largest element: {largest[0]} {largest[1]:,} B")
+
+
+if __name__ == "__main__":
+    main()
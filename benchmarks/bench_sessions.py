@@ -0,0 +1,47 @@
+"""多個 session (家人同時開著 app) 連到同一個程序時，整張 Expenses 表實際被讀了幾次。
+
+    python -m benchmarks.bench_sessions --sessions 4 --reruns 5
+"""
+import argparse
+import time
+
+from benchmarks.app_harness import make_app_test
+from benchmarks.bench_append import make_rows
+from benchmarks.fake_gsheets import FakeGSheetsConnection, FakeWorksheet
+from storage import COUPON_COLUMNS, EXPENSE_COLUMNS
+
+
+def spent(at):
+    return next(m.value for m in at.metric if m.label == "💸 本月已花費")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    expenses = FakeWorksheet("Expenses", [EXPENSE_COLUMNS] + make_rows(args.rows))
+    conn = FakeGSheetsConnection([expenses, FakeWorksheet("Coupons", [COUPON_COLUMNS])])
+    # 直連 Google Sheet 的模式 (SQLite 模式下 Sheet 只在啟動與定期 pull 時讀)
+    sessions = [make_app_test(conn, backend="sheets", fresh=i == 0) for i in range(args.sessions)]
+
+    start = time.perf_counter()
+    for _ in range(args.reruns):
+        for at in sessions: at.run()
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{args.sessions} sessions x {args.reruns} reruns: {expenses.full_reads} full reads, {elapsed:,.0f} ms")
+
+    # 第一個 session 記一筆，其他 session 下一次 rerun 就要看到，而且不重讀整張表
+    reads = expenses.full_reads
+    first = sessions[0]
+    [n for n in first.number_input if n.label == "💲 金額"][0].set_value(120)
+    [b for b in first.button if "確認儲存" in b.label][0].click()
+    first.run()
+    for at in sessions[1:]: at.run()
+    print(f"after one save: {expenses.full_reads - reads} full reads, 本月已花費 per session: {[spent(at) for at in sessions]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""各分頁一次 rerun 的時間：整支 script 與選到的那一頁各花多少。
+
+    python -m benchmarks.bench_views --rows 10000
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.app_harness import make_app_test
+from benchmarks.bench_append import make_rows
+from benchmarks.fake_gsheets import FakeGSheetsConnection, FakeWorksheet
+from storage import COUPON_COLUMNS, EXPENSE_COLUMNS
+
+VIEWS = ["📝 記帳", "📊 分析", "📋 列表", "🎒 背包"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    coupons = [COUPON_COLUMNS] + [[f"C{i}", f"禮物 {i}", "", "持有中" if i % 2 else "已使用", "2026-01-01 12:00:00"] for i in range(20)]
+    conn = FakeGSheetsConnection([
+        FakeWorksheet("Expenses", [EXPENSE_COLUMNS] + make_rows(args.rows)),
+        FakeWorksheet("Coupons", coupons),
+    ])
+    at = make_app_test(conn)
+    at.run()
+    print(f"{args.rows} rows, median of {args.repeat} reruns")
+    print(f"{'view':<10}{'rerun ms':>10}{'view ms':>10}")
+    for view in VIEWS:
+        at.session_state["view"] = view
+        at.run()  # 先暖一次 (第一次切到這頁會建圖、讀 Coupons)
+        total, part = [], []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            at.run()
+            total.append((time.perf_counter() - start) * 1000)
+            # 舊版 (st.tabs) 沒有分頁計時，只看整支 script
+            part.append(at.session_state["render_ms"][view] if "render_ms" in at.session_state else float("nan"))
+        print(f"{view:<10}{statistics.median(total):>10.1f}{statistics.median(part):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import csv
+import json
+import os
+import time
+from datetime import timedelta
+
+import pandas as pd
+from gspread.utils import a1_to_rowcol
+
+
+# --- 🧪 本機假的 Google Sheet (不用網路就能量測) ---
+class FakeWorksheet:
+    """模擬 gspread Worksheet：每次呼叫都把請求/回應做一次 JSON 往返，並可加上網路延遲。"""
+
+    def __init__(self, title, rows, rtt=0.0, bytes_per_sec=None):
+        self.title = title
+        self._rows = [list(r) for r in rows]
+        self.rtt = rtt
+        self.bytes_per_sec = bytes_per_sec
+        self.bytes_sent = 0
+        self.calls = 0
+        self.full_reads = 0
+
+    def _wire(self, payload):
+        blob = json.dumps(payload, ensure_ascii=False, default=str)
+        self.calls += 1
+        self.bytes_sent += len(blob.encode())
+        delay = self.rtt
+        if self.bytes_per_sec:
+            delay += len(blob.encode()) / self.bytes_per_sec
+        if delay:
+            time.sleep(delay)
+        return json.loads(blob)
+
+    def row_values(self, row):
+        return self._wire(self._rows[row - 1] if row <= len(self._rows) else [])
+
+    def col_values(self, col):
+        return self._wire([r[col - 1] if len(r) >= col else "" for r in self._rows])
+
+    def delete_rows(self, start_index, end_index=None):
+        del self._rows[start_index - 1:(end_index or start_index)]
+        return self._wire({})
+
+    @property
+    def col_count(self):
+        return max((len(r) for r in self._rows), default=0)
+
+    def add_cols(self, cols):
+        return self._wire({})
+
+    def batch_update(self, data, **kwargs):
+        for item in self._wire(data):
+            top, left = a1_to_rowcol(item["range"].split(":")[0])
+            for i, values in enumerate(item["values"]):
+                while len(self._rows) < top + i: self._rows.append([])
+                cells = self._rows[top + i - 1]
+                cells.extend([""] * (left + len(values) - 1 - len(cells)))
+                cells[left - 1:left - 1 + len(values)] = values
+        return {"totalUpdatedCells": sum(len(v) for item in data for v in item["values"])}
+
+    def get_all_values(self):
+        self.full_reads += 1
+        return self._wire(self._rows)
+
+    def append_rows(self, values, value_input_option="RAW", insert_data_option=None, table_range=None, include_values_in_response=False):
+        values = self._wire(values)
+        if value_input_option == "USER_ENTERED":
+            # 跟 Google Sheet 一樣：開頭的 ' 表示存成文字，本身不會留在格子裡
+            values = [[v[1:] if isinstance(v, str) and v.startswith("'") else v for v in row] for row in values]
+        start = len(self._rows) + 1
+        self._rows.extend(values)
+        end = len(self._rows)
+        updates = {"updatedRange": f"{self.title}!A{start}:D{end}", "updatedRows": len(values)}
+        if include_values_in_response:
+            updates["updatedData"] = {"values": values}
+        return self._wire({"updates": updates})
+
+    def clear(self):
+        self._rows = self._rows[:0]
+        return self._wire({})
+
+    def update(self, values):
+        self._rows = self._wire(values)
+        return {"updatedRows": len(self._rows)}
+
+
+class _FakeClient:
+    def __init__(self, worksheets):
+        self.worksheets = worksheets
+        self.opens = 0
+
+    def _select_worksheet(self, worksheet=None, **kwargs):
+        # 真的 client 每次都重新開試算表、再找分頁：兩次讀 metadata 的往返
+        ws = self.worksheets[worksheet]
+        self.opens += 1
+        for _ in range(2): ws._wire({"sheets": [{"properties": {"title": ws.title}}]})
+        return ws
+
+
+class FakeGSheetsConnection:
+    """介面跟 GSheetsConnection 一樣的 read / update / reset；read 的 ttl 快取行為也照著做 (0 = 不快取、None = 不過期)。"""
+
+    def __init__(self, worksheets):
+        self.client = _FakeClient({ws.title: ws for ws in worksheets})
+        self._cache = {}
+        self.reads = 0
+
+    @classmethod
+    def from_csv(cls, directory, rtt=0.0, bytes_per_sec=None):
+        # 每個 <分頁名稱>.csv 是一張工作表，第一列是表頭
+        worksheets = []
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".csv"): continue
+            with open(os.path.join(directory, name), newline="", encoding="utf-8") as f:
+                worksheets.append(FakeWorksheet(name[:-4], list(csv.reader(f)), rtt=rtt, bytes_per_sec=bytes_per_sec))
+        return cls(worksheets)
+
+    def to_csv(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for title, ws in self.client.worksheets.items():
+            with open(os.path.join(directory, f"{title}.csv"), "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerows(ws._rows)
+
+    def set_latency(self, rtt=0.0, bytes_per_sec=None):
+        for ws in self.client.worksheets.values():
+            ws.rtt, ws.bytes_per_sec = rtt, bytes_per_sec
+
+    def read(self, worksheet=None, ttl=None, **kwargs):
+        if isinstance(ttl, timedelta): ttl = ttl.total_seconds()
+        cached = self._cache.get(worksheet)
+        if ttl != 0 and cached is not None and (ttl is None or time.monotonic() - cached[0] < ttl):
+            return cached[1].copy()
+        self.reads += 1
+        values = self.client.worksheets[worksheet].get_all_values()
+        df = pd.DataFrame(values[1:], columns=values[0]) if values else pd.DataFrame()
+        if ttl != 0: self._cache[worksheet] = (time.monotonic(), df)
+        return df.copy()
+
+    def update(self, worksheet=None, data=None, **kwargs):
+        # 跟 GSheetsConnection 一樣，寫入不會清掉 read 的快取 (要自己 reset)
+        ws = self.client.worksheets[worksheet]
+        ws.clear()
+        ws.update([list(data.columns)] + data.astype(object).where(data.notna(), "").values.tolist())
+        return data
+
+    def reset(self):
+        self._cache.clear()
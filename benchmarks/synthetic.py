@@ -0,0 +1,92 @@
+"""產生像真的一樣的記帳歷史 (Expenses) 與獎券 (Coupons)，給 benchmark 或本機試玩用。
+
+    python -m benchmarks.synthetic --rows 10000 --out data/synthetic
+    # 之後可用 FakeGSheetsConnection.from_csv("data/synthetic") 讀回來
+"""
+import argparse
+import random
+from datetime import date, datetime, time, timedelta
+
+from benchmarks.fake_gsheets import FakeGSheetsConnection, FakeWorksheet
+from storage import COUPON_COLUMNS, DATE_FORMAT, EXPENSE_COLUMNS
+
+# 分類與 app.py 記帳表單一致：(分類, 平均每天幾筆, 金額範圍, 常見備註)
+CATEGORIES = [
+    ("🍔 飲食 (三餐/飲料)", 1.6, (40, 400), ["早餐", "午餐", "晚餐", "手搖飲", "咖啡", "宵夜"]),
+    ("🛒 日用 (超市/藥妝)", 0.35, (50, 1500), ["全聯", "家樂福", "屈臣氏", "衛生紙"]),
+    ("🚗 交通 (車票/加油)", 0.45, (30, 1500), ["加油", "捷運", "停車", "高鐵"]),
+    ("🏠 居家 (房貸/水電)", 0.05, (300, 3000), ["電費", "水費", "瓦斯", "網路"]),
+    ("👗 服飾 (衣物/鞋包)", 0.06, (300, 4000), ["Uniqlo", "鞋子", "外套"]),
+    ("💆‍♂️ 醫療 (看診/藥品)", 0.05, (150, 2000), ["掛號", "藥局", "牙醫"]),
+    ("🎮 娛樂 (旅遊/遊戲)", 0.12, (200, 6000), ["電影", "遊戲", "住宿", "門票"]),
+    ("📚 教育 (書籍/課程)", 0.04, (200, 3000), ["書", "線上課程"]),
+    ("💼 保險稅務", 0.01, (2000, 20000), ["保費", "牌照稅", "所得稅"]),
+    ("👶 子女 (尿布/學費)", 0.25, (100, 3000), ["尿布", "奶粉", "玩具", "學費"]),
+    ("💸 其他", 0.08, (50, 2000), ["紅包", "禮物", ""]),
+]
+MONTHLY = [("🏠 居家 (房貸/水電)", 5, 28000, "房貸")]
+PRIZES = ["按摩券", "蛋糕", "一日自由", "大餐", "電影約會", "睡到自然醒", "洗碗豁免券", "小禮物"]
+
+
+def _amount(rng, low, high):
+    # 小額多、大額少，取整到 10 元
+    return int(round(low * (high / low) ** rng.random(), -1)) or 10
+
+
+def generate_expenses(n_rows, end=None, seed=0, skip_rate=0.08):
+    """從 end 往回一天一天產生，湊滿 n_rows 列後依時間由舊到新回傳 (跟表上 append 的順序一樣)。"""
+    rng = random.Random(seed)
+    day = end or (datetime.utcnow() + timedelta(hours=8)).date()
+    days = []
+    while sum(len(d) for d in days) < n_rows:
+        entries = []
+        if rng.random() >= skip_rate:
+            for category, per_day, (low, high), notes in CATEGORIES:
+                count = int(per_day) + (rng.random() < per_day - int(per_day))
+                for _ in range(count):
+                    at = time(rng.randrange(7, 24), rng.randrange(60), rng.randrange(60))
+                    entries.append((at, category, _amount(rng, low, high), rng.choice(notes)))
+        for category, dom, amount, note in MONTHLY:
+            if day.day == dom: entries.append((time(9, 0), category, amount, note))
+        entries.sort()
+        days.append([[datetime.combine(day, at).strftime(DATE_FORMAT), category, amount, note, "%012x" % rng.getrandbits(48)]
+                     for at, category, amount, note in entries])
+        day -= timedelta(days=1)
+    rows = [row for entries in reversed(days) for row in entries]
+    return rows[len(rows) - n_rows:]
+
+
+def generate_coupons(n=24, seed=0, today=None):
+    rng = random.Random(seed)
+    today = today or date.today()
+    rows = [["ACHIEVE_21DAYS", "大餐", "連續記帳 21 天的獎勵 🎉", "待發送", ""]]
+    for i in range(n):
+        status = rng.choice(["未使用", "未使用", "持有中", "已使用"])
+        when = "" if status == "未使用" else (datetime.combine(today - timedelta(days=rng.randrange(400)), time(20, 0))).strftime(DATE_FORMAT)
+        detail = "謝謝你每天都這麼努力 ❤️\n這張券隨時可以用！" if rng.random() < 0.6 else ""
+        rows.append([f"GIFT{i:03d}", rng.choice(PRIZES), detail, status, when])
+    return rows
+
+
+def make_connection(n_rows, n_coupons=24, seed=0, rtt=0.0, bytes_per_sec=None):
+    return FakeGSheetsConnection([
+        FakeWorksheet("Expenses", [EXPENSE_COLUMNS] + generate_expenses(n_rows, seed=seed), rtt=rtt, bytes_per_sec=bytes_per_sec),
+        FakeWorksheet("Coupons", [COUPON_COLUMNS] + generate_coupons(n_coupons, seed=seed), rtt=rtt, bytes_per_sec=bytes_per_sec),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--coupons", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="data/synthetic")
+    args = parser.parse_args()
+    conn = make_connection(args.rows, args.coupons, args.seed)
+    conn.to_csv(args.out)
+    rows = conn.client.worksheets["Expenses"]._rows
+    print(f"wrote {len(rows) - 1} expenses ({rows[1][0][:10]} ~ {rows[-1][0][:10]}) and {args.coupons + 1} coupons to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from perf import profiler
+from storage import DATE_FORMAT, EXPENSE_COLUMNS, new_expense_ids, parse_dates
+
+IMPORT_CHUNK = 20000
+EXPORT_CHUNK = 20000
+DEFAULT_CATEGORY = "💸 其他"
+MAX_REPORTED_ERRORS = 20
+
+# 其他記帳 App 匯出的欄位名稱 (英文不分大小寫)
+COLUMN_ALIASES = {
+    "date": "Date", "日期": "Date", "時間": "Date",
+    "category": "Category", "分類": "Category", "類別": "Category",
+    "amount": "Amount", "金額": "Amount",
+    "note": "Note", "備註": "Note", "說明": "Note",
+}
+
+
+# --- 📥 批次匯入：分塊讀 CSV、整欄驗證、用雜湊索引去重 ---
+def _rename_columns(chunk):
+    columns = {col: COLUMN_ALIASES.get(str(col).strip().lower(), str(col).strip()) for col in chunk.columns}
+    chunk = chunk.rename(columns=columns)
+    missing = [col for col in ("Date", "Amount") if col not in chunk.columns]
+    if missing: raise ValueError(f"CSV 缺少欄位：{', '.join(missing)}")
+    return chunk.reindex(columns=["Date", "Category", "Amount", "Note"], fill_value="")
+
+
+def _parse_import_dates(dates):
+    # 大部分是固定格式 (parse_dates 整欄處理)，剩下格式混雜的少數列才逐列推斷
+    parsed = parse_dates(dates.where(dates != ""))
+    missed = parsed.isna() & (dates != "")
+    if missed.any():
+        parsed[missed] = pd.to_datetime(dates[missed], format="mixed", errors="coerce")
+    return parsed
+
+
+def validate_chunk(chunk):
+    """整理一塊 CSV：回傳 (合格的列, 不合格的列與原因)；index 保留原始列號。"""
+    chunk = _rename_columns(chunk)
+    dates = _parse_import_dates(chunk["Date"].str.strip())
+    # "$1,200"、"NT$ 80" 這類寫法只留數字
+    amounts = pd.to_numeric(chunk["Amount"].str.replace(r"[^\d.\-]", "", regex=True), errors="coerce")
+    bad_date, bad_amount = dates.isna(), ~(amounts > 0)
+    reason = np.select([bad_date, bad_amount], ["日期格式錯誤", "金額不是正數"], default="")
+    valid = reason == ""
+    category = chunk["Category"].str.strip()
+    rows = pd.DataFrame({
+        "Date": dates[valid].dt.strftime(DATE_FORMAT),
+        "Category": category[valid].where(category[valid] != "", DEFAULT_CATEGORY),
+        "Amount": amounts[valid],
+        "Note": chunk["Note"].str.strip()[valid],
+    })
+    rows["Date_dt"] = dates[valid]
+    return rows, pd.Series(reason[~valid], index=chunk.index[~valid])
+
+
+def dedupe_keys(dates, amounts, notes):
+    # (日期, 金額, 備註) 的 64-bit 雜湊；日期只比到「天」，別的 App 匯出的資料常常沒有時間
+    days = dates.dt.floor("D").dt.as_unit("s").astype("int64").to_numpy() // 86400
+    keys = pd.DataFrame({"day": days, "amount": np.round(np.asarray(amounts, dtype=float), 2), "note": np.asarray(notes, dtype=object)})
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+class DedupeIndex:
+    """每個鍵已經有幾筆；同一個鍵匯入的第 k 筆，只有在原本不到 k 筆時才算新的 (同一天兩杯一樣的咖啡不會被吃掉)。"""
+
+    def __init__(self):
+        self.existing = pd.Series(dtype="int64")
+        self.seen = pd.Series(dtype="int64")
+
+    def add_existing(self, dates, amounts, notes):
+        valid = dates.notna().to_numpy()
+        if not valid.any(): return
+        keys = dedupe_keys(dates[valid], np.asarray(amounts)[valid], np.asarray(notes)[valid])
+        self.existing = self.existing.add(pd.Series(keys).value_counts(), fill_value=0).astype("int64")
+
+    def take(self, keys):
+        keys = pd.Series(keys)
+        nth = keys.groupby(keys).cumcount() + keys.map(self.seen).fillna(0).astype("int64")
+        self.seen = self.seen.add(keys.value_counts(), fill_value=0).astype("int64")
+        return (nth >= keys.map(self.existing).fillna(0).astype("int64")).to_numpy()
+
+
+def read_chunks(source, chunksize=IMPORT_CHUNK, encoding="utf-8-sig"):
+    # 全部當字串讀，空白格留空字串 (不要變成 NaN)，之後由 validate_chunk 一起轉型
+    return pd.read_csv(source, dtype=str, keep_default_na=False, skipinitialspace=True,
+                       skip_blank_lines=True, chunksize=chunksize, encoding=encoding)
+
+
+def _prepare(source, frame, archive, chunksize, encoding):
+    index = DedupeIndex()
+    if not frame.empty: index.add_existing(frame["Date_dt"], frame["Amount"], frame["Note"])
+    loaded = set()
+    report = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0, "errors": []}
+    accepted = []
+    for chunk in read_chunks(source, chunksize, encoding):
+        rows, errors = validate_chunk(chunk)
+        report["read"] += len(chunk)
+        report["invalid"] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(report["errors"])
+        report["errors"] += [(int(line) + 2, reason) for line, reason in errors.iloc[:max(room, 0)].items()]
+        # 補記到已歸檔的月份時，把那個月的明細也算進已有的紀錄
+        if archive is not None:
+            months = set(rows["Date_dt"].dt.strftime("%Y-%m").unique()) & set(archive.months())
+            for month in months - loaded:
+                old = archive.load_month(month)
+                index.add_existing(parse_dates(old["Date"]), pd.to_numeric(old["Amount"], errors="coerce"), old["Note"].fillna("").astype(str))
+                loaded.add(month)
+        keep = index.take(dedupe_keys(rows["Date_dt"], rows["Amount"], rows["Note"]))
+        report["duplicates"] += int((~keep).sum())
+        accepted.append(rows.loc[keep, ["Date", "Category", "Amount", "Note"]])
+    new = pd.concat(accepted, ignore_index=True) if accepted else pd.DataFrame(columns=EXPENSE_COLUMNS[:-1])
+    report["imported"] = len(new)
+    # CSV 裡的 ID 不沿用，一律給新的
+    new["ID"] = new_expense_ids(len(new))
+    return new, report
+
+
+def prepare_import(source, frame, archive=None, chunksize=IMPORT_CHUNK):
+    """讀 CSV 並跟現有紀錄 (ledger.frame + 用到的歸檔月份) 去重；回傳 (要新增的 DataFrame, 統計)，由呼叫端一次寫入。
+
+    CSV 一次只解析 chunksize 列；留在記憶體的只有通過的列 (5 欄的 DataFrame)，要一次寫入就得整批拿著。
+    """
+    with profiler.span("bulk.import") as span:
+        try:
+            rows, report = _prepare(source, frame, archive, chunksize, "utf-8-sig")
+        except UnicodeDecodeError:
+            # 台灣常見的舊 App / Excel 匯出是 Big5
+            if not hasattr(source, "seek"): raise
+            source.seek(0)
+            rows, report = _prepare(source, frame, archive, chunksize, "cp950")
+        span.update(read=report["read"], rows=report["imported"])
+    return rows, report
+
+
+# --- 📤 匯出：歸檔月份 + 目前的紀錄，每次只轉一塊成 CSV ---
+def _csv_parts(part, chunksize):
+    for start in range(0, len(part), chunksize):
+        chunk = part.iloc[start:start + chunksize]
+        if "ID" not in chunk.columns: chunk = chunk.reset_index()  # ledger.frame 的 ID 在 index
+        yield chunk.to_csv(header=False, index=False, columns=EXPENSE_COLUMNS, float_format="%.10g")
+
+
+def iter_csv(frame, archive=None, chunksize=EXPORT_CHUNK):
+    yield ",".join(EXPENSE_COLUMNS) + "\n"
+    # 歸檔月份一次只讀一個月
+    for month in sorted(archive.months()) if archive is not None else []:
+        yield from _csv_parts(archive.load_month(month), chunksize)
+    yield from _csv_parts(frame, chunksize)
+
+
+def export_csv(frame, archive=None, chunksize=EXPORT_CHUNK):
+    """iter_csv 一塊一塊寫進暫存檔 (不在記憶體裡組整份 CSV)，回傳讀取位置在開頭的檔案物件。"""
+    out = tempfile.TemporaryFile()
+    with profiler.span("bulk.export", rows=len(frame)):
+        out.write("\ufeff".encode())  # 加 BOM，Excel 打開中文才不會亂碼
+        for text in iter_csv(frame, archive, chunksize): out.write(text.encode())
+    out.seek(0)
+    return out
@@ -0,0 +1,379 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from perf import profiler
+from storage import clean_expenses, expense_rows, parse_dates
+
+
+# --- 🧮 支出資料整理 (Amount 轉數字、Date_dt、Month) ---
+def normalize_expenses(raw):
+    # 以穩定的 ID 當 index，刪除/查詢單筆都是 hash 查找
+    df = clean_expenses(raw).set_index("ID")
+    df["Date_dt"] = parse_dates(df["Date"])
+    # 月份只對不重複的值做一次字串轉換，存成 categorical
+    codes, uniques = pd.factorize(df["Date_dt"].dt.to_period("M"))
+    df["Month"] = pd.Categorical.from_codes(codes, categories=uniques.strftime("%Y-%m"))
+    return df
+
+
+def content_hashes(df):
+    # 每列 (Date, Category, Amount, Note, ID) 一個 64-bit 雜湊；原始表和整理後的表 (ID 在 index) 算出來一樣
+    ids = df["ID"] if "ID" in df.columns else df.index.to_series()
+    cols = pd.DataFrame({
+        "Date": df["Date"].astype(str).to_numpy(),
+        "Category": df["Category"].fillna("").astype(str).to_numpy(),
+        "Amount": pd.to_numeric(df["Amount"], errors="coerce").fillna(0).astype(float).to_numpy(),
+        "Note": df["Note"].fillna("").astype(str).to_numpy(),
+        "ID": ids.fillna("").astype(str).to_numpy(),
+    })
+    return pd.util.hash_pandas_object(cols, index=False).to_numpy()
+
+
+def concat_expenses(frame, new):
+    if frame.empty: return new
+    if new.empty: return frame
+    months = union_categoricals([frame["Month"].array, new["Month"].array])
+    out = pd.concat([frame.drop(columns="Month"), new.drop(columns="Month")])
+    out["Month"] = pd.Categorical(months, categories=months.categories)
+    return out
+
+
+# --- 📊 月份 / 分類彙總索引 ---
+class AggregateIndex:
+    """月總額、月×分類總額、歷史總額都存成 dict，新增/刪除一筆時直接加減。"""
+
+    def __init__(self):
+        self.total = 0.0
+        self.month_totals = {}
+        self.month_counts = {}
+        self.month_category = {}
+        self.category_totals = {}
+
+    @classmethod
+    def build(cls, frame):
+        index = cls()
+        index.add_frame(frame)
+        return index
+
+    def add_frame(self, frame, sign=1):
+        if frame.empty: return
+        self.total += sign * float(frame["Amount"].sum())
+        for cat, amount in frame.groupby("Category")["Amount"].sum().items():
+            self.category_totals[cat] = self.category_totals.get(cat, 0.0) + sign * amount
+        grouped = frame.groupby(["Month", "Category"], observed=True)["Amount"].agg(["sum", "count"])
+        for (month, cat), (amount, count) in grouped.iterrows():
+            self.month_category[(month, cat)] = self.month_category.get((month, cat), 0.0) + sign * amount
+            self.month_totals[month] = self.month_totals.get(month, 0.0) + sign * amount
+            self.month_counts[month] = self.month_counts.get(month, 0) + sign * int(count)
+        self._prune()
+
+    def add_totals(self, totals, sign=1):
+        # 歸檔月份事先算好的 月×分類 總額/筆數 (archive.MonthArchive.totals())
+        for month, cat, amount, count in totals[["Month", "Category", "Amount", "Count"]].itertuples(index=False):
+            self.total += sign * amount
+            self.category_totals[cat] = self.category_totals.get(cat, 0.0) + sign * amount
+            self.month_category[(month, cat)] = self.month_category.get((month, cat), 0.0) + sign * amount
+            self.month_totals[month] = self.month_totals.get(month, 0.0) + sign * amount
+            self.month_counts[month] = self.month_counts.get(month, 0) + sign * int(count)
+        self._prune()
+
+    def add(self, month, category, amount, sign=1):
+        self.total += sign * amount
+        self.category_totals[category] = self.category_totals.get(category, 0.0) + sign * amount
+        if pd.isna(month): return
+        self.month_category[(month, category)] = self.month_category.get((month, category), 0.0) + sign * amount
+        self.month_totals[month] = self.month_totals.get(month, 0.0) + sign * amount
+        self.month_counts[month] = self.month_counts.get(month, 0) + sign
+        if self.month_counts[month] <= 0: self._prune([month])
+
+    def _prune(self, months=None):
+        # 某個月份的紀錄都刪光了就從選單拿掉
+        for month in [m for m in (months or list(self.month_counts)) if self.month_counts[m] <= 0]:
+            del self.month_counts[month], self.month_totals[month]
+            for key in [k for k in self.month_category if k[0] == month]: del self.month_category[key]
+
+    def month_total(self, month):
+        return self.month_totals.get(month, 0.0)
+
+    def months(self):
+        return sorted(self.month_totals, reverse=True)
+
+    def category_frame(self, month=None):
+        # px.pie 的輸入，month=None 表示全部
+        if month is None: items = self.category_totals.items()
+        else: items = ((cat, v) for (m, cat), v in self.month_category.items() if m == month)
+        return pd.DataFrame([(cat, v) for cat, v in items if round(v, 6)], columns=["Category", "Amount"])
+
+
+# --- 📋 依日期新到舊排好的 ID 索引 (列表分頁用) ---
+NAT_KEY = 2 ** 63 - 1
+
+
+def _sort_key(ts):
+    # key = -時間，排序後就是新到舊；沒有日期的排最後
+    return NAT_KEY if pd.isna(ts) else -pd.Timestamp(ts).as_unit("ns").value
+
+
+class RecentIndex:
+    """全部 / 各分類各一份「新到舊」的 (key, ID) 清單；某月份在清單裡是連續一段，取第 N 頁只要 bisect + 切片。"""
+
+    def __init__(self):
+        self.lists = {None: ([], [])}
+
+    @classmethod
+    def build(cls, frame):
+        index = cls()
+        if frame.empty: return index
+        keys = -frame["Date_dt"].dt.as_unit("ns").astype("int64")
+        keys[frame["Date_dt"].isna()] = NAT_KEY
+        ordered = pd.DataFrame({"key": keys.values, "cat": frame["Category"].values}, index=frame.index)
+        ordered = ordered.sort_values("key", kind="stable")
+        index.lists[None] = (ordered["key"].tolist(), ordered.index.tolist())
+        for cat, part in ordered.groupby("cat", sort=False):
+            index.lists[cat] = (part["key"].tolist(), part.index.tolist())
+        return index
+
+    def copy(self):
+        # ledger 寫入時先複製再改，已經拿在手上的舊索引不會跟著變
+        index = RecentIndex()
+        index.lists = {name: (list(keys), list(ids)) for name, (keys, ids) in self.lists.items()}
+        return index
+
+    def add(self, expense_id, ts, category):
+        key = _sort_key(ts)
+        # 同一個時間的排在既有的後面，跟 build 的穩定排序一致 (重讀之後列表順序才不會變)
+        for name in (None, category):
+            keys, ids = self.lists.setdefault(name, ([], []))
+            pos = bisect_right(keys, key)
+            keys.insert(pos, key)
+            ids.insert(pos, expense_id)
+
+    def remove(self, expense_id, ts, category):
+        key = _sort_key(ts)
+        for name in (None, category):
+            keys, ids = self.lists.get(name, ([], []))
+            pos = bisect_left(keys, key)
+            while pos < len(keys) and keys[pos] == key and ids[pos] != expense_id: pos += 1
+            if pos < len(keys) and ids[pos] == expense_id:
+                del keys[pos], ids[pos]
+            if name is not None and not ids: self.lists.pop(name, None)
+
+    def categories(self):
+        return sorted(name for name in self.lists if name is not None)
+
+    def page(self, offset, limit, month=None, category=None):
+        keys, ids = self.lists.get(category, ([], []))
+        lo, hi = 0, len(keys)
+        if month is not None:
+            start = pd.Timestamp(f"{month}-01")
+            end = start + pd.offsets.MonthBegin(1)
+            lo, hi = bisect_right(keys, -end.as_unit("ns").value), bisect_right(keys, -start.as_unit("ns").value)
+        return ids[lo + offset:min(lo + offset + limit, hi)], hi - lo
+
+
+# --- 🔥 連勝狀態 ---
+class StreakTracker:
+    """記住最後記帳日、目前連勝與最長連勝；新增/刪除一筆只調整這幾個數字，對不上時才整個重建。"""
+
+    ONE_DAY = timedelta(days=1)
+
+    def __init__(self):
+        self.day_counts = {}
+        self.last_date = None
+        self.current = 0
+        self.longest = 0
+        self.awarded = set()
+
+    def rebuild(self, day_counts):
+        self.day_counts = dict(day_counts)
+        self.last_date, self.current, self.longest = None, 0, 0
+        if not self.day_counts: return
+        ordinals = np.array(sorted(d.toordinal() for d in self.day_counts))
+        starts = np.flatnonzero(np.diff(ordinals, prepend=ordinals[0] - 2) != 1)
+        runs = np.diff(np.append(starts, len(ordinals)))
+        self.last_date = date.fromordinal(int(ordinals[-1]))
+        self.current = int(runs[-1])
+        self.longest = int(runs.max())
+
+    @classmethod
+    def from_frame(cls, frame):
+        tracker = cls()
+        tracker.rebuild(day_counts_of(frame))
+        return tracker
+
+    def _run_through(self, day):
+        # 從某天往前/往後數連續有記帳的天數
+        start = end = day
+        while start - self.ONE_DAY in self.day_counts: start -= self.ONE_DAY
+        while end + self.ONE_DAY in self.day_counts: end += self.ONE_DAY
+        return start, end
+
+    def add(self, day):
+        self.day_counts[day] = self.day_counts.get(day, 0) + 1
+        if self.day_counts[day] > 1: return
+        if self.last_date is None or day > self.last_date + self.ONE_DAY:
+            self.last_date, self.current = day, 1
+        elif day == self.last_date + self.ONE_DAY:
+            self.last_date, self.current = day, self.current + 1
+        else:
+            # 補記以前的日子，可能把兩段連勝接起來
+            start, end = self._run_through(day)
+            if end == self.last_date: self.current = (end - start).days + 1
+            self.longest = max(self.longest, (end - start).days + 1)
+        self.longest = max(self.longest, self.current)
+
+    def remove(self, day):
+        if day not in self.day_counts: return self.rebuild(self.day_counts)
+        self.day_counts[day] -= 1
+        if self.day_counts[day] > 0: return
+        del self.day_counts[day]
+        if day == self.last_date and 1 < self.current < self.longest:
+            self.last_date, self.current = day - self.ONE_DAY, self.current - 1
+        else:
+            self.rebuild(self.day_counts)
+
+    def current_streak(self, today):
+        if self.last_date is None: return 0
+        return self.current if self.last_date in (today, today - self.ONE_DAY) else 0
+
+    def to_dict(self):
+        # 只存發過的獎；連勝天數每次載入都從每日筆數重算 (numpy 一次就好)，存了也不會讀回來
+        return {"awarded": sorted(self.awarded)}
+
+
+def day_counts_of(frame):
+    counts = frame["Date_dt"].dropna().dt.normalize().value_counts()
+    return {ts.date(): int(n) for ts, n in counts.items()}
+
+
+class ExpenseLedger:
+    """跨 rerun 保留整理好的支出表與彙總索引；原始表只是尾端多了幾列時，只整理新增的那幾列。"""
+
+    BULK_ROWS = 1000
+
+    def __init__(self, state_store=None, archive=None):
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self.state_store = state_store
+        self.archive = archive
+        self.frame = normalize_expenses(pd.DataFrame())
+        self.index = AggregateIndex()
+        self.streak = StreakTracker()
+        self.recent = RecentIndex()
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self.version = 0
+        self.fetches = 0
+        self._stale = False
+        self._loaded_at = None
+        self._source_version = None
+        if state_store is not None:
+            self.streak.awarded = set(state_store.load_state("streak", {}).get("awarded", []))
+
+    # 發獎後呼叫；新增/刪除不必寫檔
+    def save_streak(self):
+        if self.state_store is not None:
+            self.state_store.save_state("streak", self.streak.to_dict())
+
+    def _add_rows(self, new):
+        self.frame = concat_expenses(self.frame, new)
+        with profiler.span("ledger.aggregate", rows=len(new)):
+            self.index.add_frame(new)
+        # 一次加很多列 (批次匯入) 時整個重建排序清單與連勝，比一筆一筆插入快
+        bulk = len(new) > self.BULK_ROWS
+        with profiler.span("ledger.recent", rows=len(new)):
+            if bulk: self.recent = RecentIndex.build(self.frame)
+            else:
+                recent = self.recent.copy()
+                for expense_id, ts, category in zip(new.index, new["Date_dt"], new["Category"]):
+                    recent.add(expense_id, ts, category)
+                self.recent = recent
+        with profiler.span("ledger.streak", rows=len(new)):
+            if bulk:
+                day_counts = dict(self.streak.day_counts)
+                for day, count in day_counts_of(new).items(): day_counts[day] = day_counts.get(day, 0) + count
+                self.streak.rebuild(day_counts)
+            else:
+                for ts in new["Date_dt"].dropna(): self.streak.add(ts.date())
+
+    def load(self, raw):
+        # 整張表逐列比內容雜湊：沒變就直接用，只是尾端多幾列就只整理新的；表上改過任何一格 (金額、備註…) 都整個重建
+        raw = expense_rows(raw).reset_index(drop=True)
+        with self._lock:
+            n, cached = len(raw), len(self.frame)
+            hashes = content_hashes(raw)
+            if not self._stale and n == cached and np.array_equal(hashes, self._hashes):
+                return self.frame
+            previous, self._hashes = self._hashes, hashes
+            if not self._stale and 0 < cached < n and np.array_equal(hashes[:cached], previous):
+                with profiler.span("ledger.normalize", rows=n - cached, mode="append"):
+                    new = normalize_expenses(raw.iloc[cached:])
+                self._add_rows(new)
+            else:
+                with profiler.span("ledger.normalize", rows=n, mode="full"):
+                    self.frame = normalize_expenses(raw)
+                # 歸檔的月份只加總額與每日筆數，明細不進記憶體
+                with profiler.span("ledger.aggregate", rows=n):
+                    self.index = AggregateIndex.build(self.frame)
+                    if self.archive is not None: self.index.add_totals(self.archive.totals())
+                with profiler.span("ledger.recent", rows=n):
+                    self.recent = RecentIndex.build(self.frame)
+                with profiler.span("ledger.streak", rows=n):
+                    day_counts = day_counts_of(self.frame)
+                    if self.archive is not None:
+                        for day, count in self.archive.day_counts().items(): day_counts[day] = day_counts.get(day, 0) + count
+                    self.streak.rebuild(day_counts)
+            self._stale = False
+            self.version += 1
+            return self.frame
+
+    # 所有 session 共用同一份：storage 沒有新資料、也還沒過期就不讀；同時過期只有一個 session 去讀
+    def refresh(self, storage, ttl=600):
+        with self._fetch_lock:
+            source_version = storage.data_version()
+            if not self._stale and self._loaded_at is not None and source_version == self._source_version \
+                    and (source_version is not None or time.monotonic() - self._loaded_at < ttl):
+                return self.frame
+            raw = storage.read_expenses(ttl=0)
+            if self.archive is not None: raw = self.archive.exclude_pending(raw)
+            self.fetches += 1
+            frame = self.load(raw)
+            self._loaded_at, self._source_version = time.monotonic(), source_version
+            return frame
+
+    def invalidate(self):
+        # 資料被整批搬走 (月結) 之後，下一次 refresh 整個重建
+        with self._lock: self._stale = True
+
+    def snapshot(self):
+        # frame / recent / version 在寫入時都是整個換新，一起拿就是同一個時間點的資料
+        with self._lock: return self.frame, self.recent, self.version
+
+    # 寫入成功後直接套用到快取，其他 session 下一次 rerun 看 version 就知道變了，不用重讀
+    def append(self, rows):
+        with self._lock:
+            with profiler.span("ledger.normalize", rows=len(rows), mode="append"):
+                new = normalize_expenses(pd.DataFrame(rows))
+            self._add_rows(new)
+            self._hashes = np.concatenate([self._hashes, content_hashes(new)])
+            self.version += 1
+
+    def remove(self, expense_id):
+        with self._lock:
+            if expense_id not in self.frame.index:
+                self._stale = True
+                return
+            found = self.frame.loc[[expense_id]].iloc[0]
+            self.index.add(found["Month"], found["Category"], found["Amount"], sign=-1)
+            recent = self.recent.copy()
+            recent.remove(expense_id, found["Date_dt"], found["Category"])
+            self.recent = recent
+            if pd.notna(found["Date_dt"]): self.streak.remove(found["Date_dt"].date())
+            self._hashes = self._hashes[self.frame.index != expense_id]
+            self.frame = self.frame.drop(index=expense_id)
+            self.version += 1
@@ -0,0 +1,111 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HISTORY = 50
+
+
+# --- 🩺 效能紀錄 (預設關閉；secrets 設 [debug] profile = true 才記) ---
+class Profiler:
+    """各步驟最近 history 次的耗時，整個程序 (所有 session、背景同步) 共用；可另外逐筆寫成 JSON lines。"""
+
+    def __init__(self, history=200):
+        self.enabled = False
+        self.log_path = None
+        self.history = history
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def configure(self, enabled, log_path=None):
+        self.enabled = bool(enabled)
+        self.log_path = log_path if self.enabled else None
+        if self.log_path and os.path.dirname(self.log_path): os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+
+    @contextmanager
+    def span(self, name, **fields):
+        # fields 可以在區塊內補 (例如讀完才知道列數)
+        if not self.enabled:
+            yield fields
+            return
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000, **fields)
+
+    def record(self, name, ms, **fields):
+        if not self.enabled: return
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.history)).append((ms, fields))
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as log:
+                    log.write(json.dumps({"ts": time.time(), "name": name, "ms": round(ms, 3), **fields}, ensure_ascii=False, default=str) + "\n")
+
+    def summary(self):
+        with self._lock: samples = {name: list(values) for name, values in self._samples.items()}
+        rows = []
+        for name, values in sorted(samples.items()):
+            ms = np.array([v[0] for v in values])
+            p50, p95 = np.percentile(ms, [50, 95])
+            last = " ".join(f"{k}={v}" for k, v in values[-1][1].items())
+            rows.append((name, len(ms), ms[-1], p50, p95, last))
+        return pd.DataFrame(rows, columns=["step", "n", "last_ms", "p50_ms", "p95_ms", "last"])
+
+    def clear(self):
+        with self._lock: self._samples.clear()
+
+
+profiler = Profiler()
+
+
+# --- ⏱️ 操作延遲 (處理按鈕的那次執行開始 → 下一次畫面畫完) ---
+class ActionTimer:
+    """按鈕處理時記下開始時間，st.rerun 後那次畫面畫完再結算，最近幾筆留在 session_state。"""
+
+    def __init__(self, state):
+        self.state = state
+        state.setdefault("pending_action", None)
+        state.setdefault("action_latency", deque(maxlen=HISTORY))
+        self.mark()
+
+    def mark(self):
+        # 整支 script 或 fragment 開始執行時記一下，這是最接近使用者按下去的時間點
+        self.run_started = time.perf_counter()
+
+    def start(self, action):
+        if self.state["pending_action"] is None: self.state["pending_action"] = (action, self.run_started)
+
+    def finish(self):
+        pending = self.state["pending_action"]
+        if pending is None: return None
+        self.state["pending_action"] = None
+        action, since = pending
+        elapsed = (time.perf_counter() - since) * 1000
+        self.state["action_latency"].append((action, elapsed))
+        logger.info("action %s took %.1f ms until next render", action, elapsed)
+        profiler.record(f"action:{action}", elapsed)
+        return action, elapsed
+
+    def history(self):
+        return list(self.state["action_latency"])
+
+
+# --- ⏱️ 各區塊這次 rerun 花的時間 (也可當 decorator 用，fragment 單獨重跑時一樣會記) ---
+@contextmanager
+def timed(state, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        state.setdefault("render_ms", {})[name] = ms
+        profiler.record(f"view:{name}", ms)
@@ -0,0 +1,563 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+import pandas as pd
+from gspread.utils import rowcol_to_a1
+
+from perf import profiler
+
+EXPENSE_COLUMNS = ["Date", "Category", "Amount", "Note", "ID"]
+COUPON_COLUMNS = ["Code", "Prize", "Detail", "Status", "Date"]
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+APPEND_CHUNK = 10000
+
+
+class WriteNotConfirmed(Exception):
+    pass
+
+
+def new_expense_id():
+    return uuid.uuid4().hex[:12]
+
+
+def new_expense_ids(n):
+    # 批次匯入用：一次取 n 組亂數，格式跟 new_expense_id 一樣是 12 碼 hex
+    digits = os.urandom(6 * n).hex()
+    return [digits[i:i + 12] for i in range(0, 12 * n, 12)]
+
+
+def assign_ids(rows):
+    # 新紀錄沒帶 ID 的就地補上，呼叫端拿同一份 rows 更新快取時 ID 才會一致
+    # rows 可以是 dict 的 list，或是 DataFrame (批次匯入，不必先轉成上萬個 dict)
+    if isinstance(rows, pd.DataFrame):
+        if "ID" not in rows.columns: rows["ID"] = ""
+        missing = rows["ID"].fillna("").astype(str) == ""
+        if missing.any(): rows.loc[missing, "ID"] = new_expense_ids(int(missing.sum()))
+        return rows
+    for row in rows:
+        if not row.get("ID"): row["ID"] = new_expense_id()
+    return rows
+
+
+def parse_dates(dates):
+    # 先用 app 寫入的固定格式解析，失敗的少數列 (例如試算表轉成地區格式) 才走自動推斷
+    parsed = pd.to_datetime(dates, format=DATE_FORMAT, errors="coerce")
+    missed = parsed.isna() & dates.notna()
+    if missed.any():
+        parsed[missed] = pd.to_datetime(dates[missed].astype(str), errors="coerce")
+    return parsed
+
+
+def expense_rows(df):
+    # 整列空白的不要；還沒有 ID 的列 (讀取途中才在表上手打的) 先略過，下次讀取時 ensure_ids 補好 ID 才算進來，
+    # 不在記憶體裡自己編 ID (編出來的 ID 表上沒有，刪除、歸檔都對不上)
+    df = df.reindex(columns=EXPENSE_COLUMNS).dropna(how="all")
+    return df[df["ID"].fillna("").astype(str).str.strip() != ""]
+
+
+def blank_ids(df):
+    # 有日期但 ID 空白的列數 (表上手打的)；ensure_ids 補的就是這些
+    cells = df.reindex(columns=["Date", "ID"]).fillna("").astype(str)
+    return int(((cells["Date"].str.strip() != "") & (cells["ID"].str.strip() == "")).sum())
+
+
+def clean_expenses(df):
+    if df.empty: return pd.DataFrame(columns=EXPENSE_COLUMNS)
+    df = expense_rows(df).copy()
+    df["Date"] = df["Date"].astype(str)
+    df["Category"] = df["Category"].fillna("").astype(str)
+    df["Amount"] = pd.to_numeric(df["Amount"], errors="coerce").fillna(0)
+    df["Note"] = df["Note"].fillna("").astype(str)
+    df["ID"] = df["ID"].astype(str).str.strip()
+    return df
+
+
+def clean_coupons(df):
+    if df.empty: return pd.DataFrame(columns=COUPON_COLUMNS)
+    if "Detail" not in df.columns: df["Detail"] = ""
+    df = df.reindex(columns=COUPON_COLUMNS).dropna(how="all")
+    df["Code"] = df["Code"].astype(str).str.strip()
+    return df
+
+
+# --- 📦 Google Sheet 存取層 ---
+class SheetsStorage:
+    """包住 GSheetsConnection，新增紀錄時只送出新的那幾列。"""
+
+    def __init__(self, conn, state_path="data/state.json"):
+        self.conn = conn
+        self.state_path = state_path
+        self._headers = {}
+        self._worksheets = {}
+        self._lock = threading.Lock()
+        self.fetches = Counter()
+        self._filled = None
+
+    def _worksheet(self, name):
+        # client._select_worksheet 每次都重開試算表 (兩次 metadata 往返)，同一個分頁只開一次
+        if name not in self._worksheets:
+            self._worksheets[name] = self.conn.client._select_worksheet(worksheet=name)
+        return self._worksheets[name]
+
+    def _header(self, ws, default=EXPENSE_COLUMNS):
+        # 表頭只讀一次，之後依表頭順序排欄位 (表上多出來的欄位留空)
+        if ws.title not in self._headers:
+            self._headers[ws.title] = [str(h).strip() for h in ws.row_values(1)] or list(default)
+        return self._headers[ws.title]
+
+    def _read_expenses(self, ttl):
+        self.fetches["Expenses"] += 1
+        with profiler.span("sheets.read:Expenses") as span:
+            df = self.conn.read(worksheet="Expenses", ttl=ttl)
+            span["rows"] = len(df)
+        return df
+
+    def read_expenses(self, ttl=600):
+        df = self._read_expenses(ttl)
+        if not blank_ids(df): return df
+        # 表上有手打、還沒有 ID 的列：補上 ID 後不用快取重讀一次
+        # conn 的快取裡還是補之前的表，ttl 內再讀到它就直接用重讀的這份，不必每次都重查 ID 欄
+        if self._filled is not None and ttl != 0 and (ttl is None or time.monotonic() - self._filled[0] < ttl):
+            return self._filled[1].copy()
+        self.ensure_ids()
+        df = self._read_expenses(0)
+        self._filled = (time.monotonic(), df)
+        return df.copy()
+
+    def data_version(self):
+        # 別的裝置改了 Google Sheet 這裡無從得知，只能靠呼叫端的 TTL
+        return None
+
+    def append_expenses(self, rows):
+        assign_ids(rows)
+        ws = self._worksheet("Expenses")
+        header = self._header(ws)
+        if isinstance(rows, pd.DataFrame):
+            table = rows.reindex(columns=header)
+            values = table.astype(object).where(table.notna(), "").to_numpy().tolist()
+        else:
+            values = [["" if row.get(col) is None else row.get(col, "") for col in header] for row in rows]
+        # 日期、金額要 USER_ENTERED 才會被當成日期/數字；ID 前面加 ' 讓它存成文字 (全數字的 ID 不會被轉成數字、掉了開頭的 0)
+        if "ID" in header:
+            col = header.index("ID")
+            for value in values: value[col] = f"'{value[col]}"
+        updates = {}
+        # 批次匯入時一次可能上萬列，拆成每 APPEND_CHUNK 列一個 request，避免超過 API 的 payload 上限
+        for start in range(0, len(values), APPEND_CHUNK):
+            part = values[start:start + APPEND_CHUNK]
+            with self._lock, profiler.span("sheets.append:Expenses", rows=len(part)):
+                res = ws.append_rows(
+                    part,
+                    value_input_option="USER_ENTERED",
+                    insert_data_option="INSERT_ROWS",
+                    table_range="A1",
+                    include_values_in_response=True,
+                )
+            # 用 API 回傳的寫入範圍確認，不再整張表讀回來
+            updates = res.get("updates", {})
+            if updates.get("updatedRows", 0) != len(part):
+                raise WriteNotConfirmed(f"預期寫入 {len(part)} 列，實際 {updates.get('updatedRows', 0)} 列")
+        return updates.get("updatedRange")
+
+    def ensure_ids(self):
+        # 表上還沒有 ID 欄 (或有空白) 時補齊：每個空白格各自一個範圍，已經有的 ID 不重寫
+        # (整欄重寫的話，讀跟寫之間別的裝置刪了列，整欄的 ID 都會錯位)
+        ws = self._worksheet("Expenses")
+        header = self._header(ws)
+        with self._lock, profiler.span("sheets.ensure_ids:Expenses") as span:
+            dates = ws.col_values(header.index("Date") + 1)
+            if "ID" in header:
+                ids = ws.col_values(header.index("ID") + 1)
+            else:
+                header.append("ID")
+                ids = []
+                if ws.col_count < len(header): ws.add_cols(len(header) - ws.col_count)
+            col = header.index("ID") + 1
+            # 只補有日期的列；ID 欄比日期欄長 (日期被清掉的列) 也不會對不上
+            missing = [n for n, date in enumerate(dates[1:], start=2)
+                       if str(date).strip() and not (n <= len(ids) and str(ids[n - 1]).strip())]
+            cells = [(n, new_expense_id()) for n in missing]
+            if not ids or ids[0] != "ID": cells.insert(0, (1, "ID"))
+            if cells:
+                ws.batch_update([{"range": rowcol_to_a1(n, col), "values": [[value]]} for n, value in cells],
+                                value_input_option="RAW")
+            span["rows"] = len(missing)
+        return len(missing)
+
+    def delete_expense(self, expense_id):
+        # 只讀 ID 那一欄找到列號，刪掉那一列
+        ws = self._worksheet("Expenses")
+        header = self._header(ws)
+        with self._lock, profiler.span("sheets.delete:Expenses"):
+            ids = ws.col_values(header.index("ID") + 1)
+            if str(expense_id) not in ids[1:]: return False
+            ws.delete_rows(ids.index(str(expense_id), 1) + 1)
+        return True
+
+    def delete_expenses(self, expense_ids):
+        # 一次刪很多列 (月結用)：找出列號後把連續的列併成一段，從下面往上刪，列號才不會跑掉
+        ws = self._worksheet("Expenses")
+        header = self._header(ws)
+        wanted = {str(i) for i in expense_ids}
+        with self._lock, profiler.span("sheets.delete_many:Expenses", rows=len(wanted)):
+            ids = ws.col_values(header.index("ID") + 1)
+            rows = [n for n, v in enumerate(ids, start=1) if n > 1 and v in wanted]
+            runs = []
+            for n in rows:
+                if runs and runs[-1][1] == n - 1: runs[-1][1] = n
+                else: runs.append([n, n])
+            for start, end in reversed(runs): ws.delete_rows(start, end)
+        return len(rows)
+
+    def existing_ids(self):
+        ws = self._worksheet("Expenses")
+        header = self._header(ws)
+        if "ID" not in header: return set()
+        with profiler.span("sheets.read_ids:Expenses"):
+            return set(ws.col_values(header.index("ID") + 1)[1:])
+
+    def sync_status(self):
+        # 直接寫 Google Sheet，沒有待同步的佇列
+        return None
+
+    def read_coupons(self, ttl=0):
+        self.fetches["Coupons"] += 1
+        with profiler.span("sheets.read:Coupons") as span:
+            df = clean_coupons(self.conn.read(worksheet="Coupons", ttl=ttl))
+            span["rows"] = len(df)
+        return df
+
+    def update_coupon_status(self, code, status, date, expected=None):
+        # 只改那一列的 Status / Date 兩格；expected 給了就先確認目前狀態 (compare-and-set)
+        ws = self._worksheet("Coupons")
+        header = self._header(ws, COUPON_COLUMNS)
+        code = str(code).strip()
+        with self._lock, profiler.span("sheets.update:Coupons"):
+            codes = [str(c).strip() for c in ws.col_values(header.index("Code") + 1)]
+            if code not in codes[1:]: return False
+            n = codes.index(code, 1) + 1
+            current = dict(zip(header, ws.row_values(n))).get("Status", "")
+            if expected is not None and current not in expected: return False
+            ws.batch_update([
+                {"range": rowcol_to_a1(n, header.index("Status") + 1), "values": [[status]]},
+                {"range": rowcol_to_a1(n, header.index("Date") + 1), "values": [[date]]},
+            ], value_input_option="USER_ENTERED")
+        return True
+
+    # 連勝等衍生狀態存在本機 JSON 檔
+    def _read_state_file(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load_state(self, key, default=None):
+        return self._read_state_file().get(key, default)
+
+    def save_state(self, key, value):
+        state = self._read_state_file()
+        state[key] = value
+        if os.path.dirname(self.state_path): os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with open(self.state_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+
+
+# --- 🎟️ Coupons 快取 ---
+class CouponRepository:
+    """Coupons 讀一次快取 ttl 秒；兌換/使用/發獎寫入後立刻失效，下次用到才重讀。"""
+
+    def __init__(self, storage, ttl=300):
+        self.storage = storage
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cached = None
+        self._loaded_at = 0.0
+        self._source_version = None
+
+    def load(self):
+        with self._lock:
+            source_version = self.storage.data_version()
+            if self._cached is None or source_version != self._source_version or time.monotonic() - self._loaded_at > self.ttl:
+                self._cached = clean_coupons(self.storage.read_coupons(ttl=0))
+                self._loaded_at, self._source_version = time.monotonic(), source_version
+            return self._cached.copy()
+
+    def invalidate(self):
+        with self._lock:
+            self._cached = None
+
+    def update_status(self, code, status, date, expected=None):
+        try:
+            return self.storage.update_coupon_status(code, status, date, expected)
+        finally:
+            self.invalidate()
+
+
+# --- 💾 本機 SQLite 主資料庫 (Google Sheet 只當同步目標) ---
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid TEXT, date TEXT NOT NULL, day TEXT, month TEXT,
+    category TEXT NOT NULL DEFAULT '', amount REAL NOT NULL DEFAULT 0, note TEXT NOT NULL DEFAULT ''
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_expenses_uid ON expenses(uid);
+CREATE INDEX IF NOT EXISTS idx_expenses_day ON expenses(day);
+CREATE INDEX IF NOT EXISTS idx_expenses_month ON expenses(month);
+CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses(category);
+CREATE TABLE IF NOT EXISTS coupons (
+    code TEXT PRIMARY KEY, prize TEXT, detail TEXT, status TEXT, date TEXT
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT NOT NULL, payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class SQLiteStorage:
+    """所有讀寫都先落在本機 SQLite，再由背景執行緒把變更同步到 Google Sheet。"""
+
+    def __init__(self, path, remote=None, pull_interval=600):
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.remote = remote
+        self.pull_interval = pull_interval
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # 舊版資料庫沒有 uid 欄，先補欄位 (bootstrap 時會重新從 Google Sheet 拉一次帶 ID 的資料)
+        if self.db.execute("SELECT name FROM sqlite_master WHERE name = 'expenses'").fetchone():
+            if "uid" not in [c[1] for c in self.db.execute("PRAGMA table_info(expenses)")]:
+                self.db.execute("ALTER TABLE expenses ADD COLUMN uid TEXT")
+        self.db.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._sync_thread = None
+        self.last_sync_error = None
+        self.last_synced_at = None
+        self.failures = 0
+        self.retry_at = 0.0
+        self.pulls = 0
+        self.fetches = Counter()
+
+    # 日期欄另外存成 day / month，查詢與索引都用這兩欄
+    def _expense_params(self, rows):
+        df = clean_expenses(pd.DataFrame(rows))
+        dt = parse_dates(df["Date"])
+        df["day"] = dt.dt.strftime("%Y-%m-%d")
+        df["month"] = dt.dt.strftime("%Y-%m")
+        df = df.astype(object).where(df.notna(), None)
+        return list(df[["ID", "Date", "day", "month", "Category", "Amount", "Note"]].itertuples(index=False, name=None))
+
+    def _enqueue(self, op, payload):
+        if isinstance(payload, pd.DataFrame): payload = payload[EXPENSE_COLUMNS].to_json(orient="records", force_ascii=False)
+        else: payload = json.dumps(payload, ensure_ascii=False, default=str)
+        self.db.execute("INSERT INTO outbox (op, payload) VALUES (?, ?)", (op, payload))
+        self._wake.set()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.db.execute("BEGIN")
+            try:
+                yield
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def _read_sql(self, sql):
+        with self._lock:
+            return pd.read_sql_query(sql, self.db)
+
+    def read_expenses(self, ttl=None):
+        self.fetches["Expenses"] += 1
+        with profiler.span("sqlite.read:Expenses") as span:
+            df = self._read_sql(
+                "SELECT date AS Date, category AS Category, amount AS Amount, note AS Note, uid AS ID FROM expenses ORDER BY expenses.id")
+            span["rows"] = len(df)
+        return df
+
+    def append_expenses(self, rows):
+        assign_ids(rows)
+        with self._transaction():
+            self.db.executemany(
+                "INSERT INTO expenses (uid, date, day, month, category, amount, note) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._expense_params(rows))
+            self._enqueue("append", rows)
+
+    def delete_expense(self, expense_id):
+        with self._transaction():
+            cur = self.db.execute("DELETE FROM expenses WHERE uid = ?", (str(expense_id),))
+            if cur.rowcount: self._enqueue("delete", str(expense_id))
+        return cur.rowcount > 0
+
+    def delete_expenses(self, expense_ids):
+        ids = [str(i) for i in expense_ids]
+        deleted = 0
+        with self._transaction():
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                deleted += self.db.execute(f"DELETE FROM expenses WHERE uid IN ({', '.join('?' * len(chunk))})", chunk).rowcount
+            if ids: self._enqueue("delete_many", ids)
+        return deleted
+
+    def read_coupons(self, ttl=None):
+        self.fetches["Coupons"] += 1
+        with profiler.span("sqlite.read:Coupons") as span:
+            df = self._read_sql(
+                "SELECT code AS Code, prize AS Prize, detail AS Detail, status AS Status, date AS Date FROM coupons")
+            span["rows"] = len(df)
+        return df
+
+    def update_coupon_status(self, code, status, date, expected=None):
+        sql, params = "UPDATE coupons SET status = ?, date = ? WHERE code = ?", [status, date, str(code).strip()]
+        if expected is not None:
+            expected = list(expected)
+            sql += f" AND status IN ({', '.join('?' * len(expected))})"
+            params += expected
+        with self._transaction():
+            cur = self.db.execute(sql, params)
+            if cur.rowcount: self._enqueue("coupon_status", [str(code).strip(), status, date, expected])
+        return cur.rowcount > 0
+
+    def load_state(self, key, default=None):
+        found = self._query("SELECT value FROM meta WHERE key = ?", (f"state:{key}",))
+        return json.loads(found[0][0]) if found else default
+
+    def save_state(self, key, value):
+        self._query("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (f"state:{key}", json.dumps(value, ensure_ascii=False)))
+
+    # --- 🔄 與 Google Sheet 同步 ---
+    def pending_count(self):
+        return self._query("SELECT count(*) FROM outbox")[0][0]
+
+    def pull(self):
+        # 本機還有沒送出的變更時不覆蓋，避免把剛記的帳蓋掉
+        expenses = clean_expenses(self.remote.read_expenses(ttl=0))
+        coupons = self.remote.read_coupons(ttl=0)
+        with self._transaction(), profiler.span("sync.pull", rows=len(expenses)):
+            if self.pending_count(): return False
+            self.db.execute("DELETE FROM expenses")
+            self.db.executemany(
+                "INSERT INTO expenses (uid, date, day, month, category, amount, note) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._expense_params(expenses))
+            self.db.execute("DELETE FROM coupons")
+            self.db.executemany(
+                "INSERT OR REPLACE INTO coupons (code, prize, detail, status, date) VALUES (?, ?, ?, ?, ?)",
+                coupons.astype(object).where(coupons.notna(), None)[COUPON_COLUMNS].itertuples(index=False, name=None))
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('pulled_at', ?)", (str(time.time()),))
+            self.pulls += 1
+        return True
+
+    def data_version(self):
+        # 本機資料只有 pull 會從外面換掉；自己的寫入已經直接套用到共用的 ledger
+        return self.pulls
+
+    def bootstrap(self):
+        # 第一次啟動 (本機是空的) 先從 Google Sheet 抓一份
+        if self.remote is None: return
+        if not self._query("SELECT value FROM meta WHERE key = 'pulled_at'") \
+                or self._query("SELECT 1 FROM expenses WHERE uid IS NULL LIMIT 1"):
+            # 連不上就先用本機 (可能是空的) 開起來，背景同步會照退避時間再拉
+            try: self.pull()
+            except Exception as e: self._sync_failed(e)
+
+    def _sync_failed(self, error):
+        # 指數退避 (最多 5 分鐘)，加一點隨機避免多個行程同時重試
+        self.last_sync_error = error
+        self.failures += 1
+        self.retry_at = time.time() + min(2 ** self.failures, 300) * random.uniform(0.8, 1.2)
+
+    def _ack(self, op_ids):
+        if not op_ids: return
+        self._query(f"DELETE FROM outbox WHERE id IN ({', '.join('?' * len(op_ids))})", list(op_ids))
+        self.last_synced_at = time.time()
+
+    def flush(self, limit=500):
+        # 連續的新增合併成一次 append；還沒送出就被刪掉的紀錄，新增和刪除都不必送
+        ops = self._query("SELECT id, op, payload FROM outbox ORDER BY id LIMIT ?", (limit,))
+        if not ops: return 0
+        with profiler.span("sync.flush", ops=len(ops)):
+            self._flush_ops(ops)
+        return len(ops)
+
+    def _flush_ops(self, ops):
+        batch, batch_ops = {}, []
+
+        def send_batch():
+            if batch:
+                rows = list(batch.values())
+                if self.failures:
+                    # 重試時上一次可能其實已經寫進去了，先排除表上已有的 ID 避免重複
+                    existing = self.remote.existing_ids()
+                    rows = [row for row in rows if row["ID"] not in existing]
+                if rows: self.remote.append_expenses(rows)
+            self._ack(batch_ops)
+            batch.clear()
+            batch_ops.clear()
+
+        for op_id, op, payload in ops:
+            payload = json.loads(payload)
+            if op == "append":
+                for row in payload: batch[row["ID"]] = row
+                batch_ops.append(op_id)
+                continue
+            if op == "delete" and payload in batch:
+                del batch[payload]
+                batch_ops.append(op_id)
+                continue
+            if op == "delete_many":
+                # 還在批次裡沒送出的直接拿掉，其餘的一次刪
+                payload = [i for i in payload if batch.pop(i, None) is None]
+            send_batch()
+            if op == "delete": self.remote.delete_expense(payload)
+            elif op == "delete_many" and payload: self.remote.delete_expenses(payload)
+            elif op == "coupon_status": self.remote.update_coupon_status(*payload)
+            self._ack([op_id])
+        send_batch()
+
+    def sync_status(self):
+        return {
+            "pending": self.pending_count(),
+            "last_synced_at": self.last_synced_at,
+            "error": self.last_sync_error,
+            "retry_in": max(self.retry_at - time.time(), 0) if self.failures else 0,
+        }
+
+    def request_sync(self):
+        self.retry_at = 0.0
+        self._wake.set()
+
+    def _sync_loop(self, interval, batch_window):
+        while True:
+            delay = max(self.retry_at - time.time(), 0.1) if self.failures else interval
+            if self._wake.wait(delay):
+                # 被新寫入叫醒時稍等一下，讓連續幾筆一起送
+                time.sleep(batch_window)
+            self._wake.clear()
+            if self.failures and time.time() < self.retry_at: continue
+            try:
+                while self.flush(): pass
+                pulled_at = self._query("SELECT value FROM meta WHERE key = 'pulled_at'")
+                if not pulled_at or time.time() - float(pulled_at[0][0]) > self.pull_interval:
+                    self.pull()
+                self.last_sync_error, self.failures = None, 0
+            except Exception as e:
+                self._sync_failed(e)
+
+    def start_sync(self, interval=5, batch_window=1.5):
+        if self.remote is None or self._sync_thread is not None: return
+        self._sync_thread = threading.Thread(
+            target=self._sync_loop, args=(interval, batch_window), daemon=True, name="sheets-sync")
+        self._sync_thread.start()
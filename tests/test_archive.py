@@ -0,0 +1,57 @@
+import pytest
+
+from archive import MonthArchive
+from benchmarks.fake_gsheets import FakeGSheetsConnection, FakeWorksheet
+from ledger import ExpenseLedger
+from storage import EXPENSE_COLUMNS, SheetsStorage
+
+DECEMBER = [[f"2025-12-{d:02d} 08:00:00", "🍔 飲食 (三餐/飲料)", 65, "咖啡", f"{d:012x}"] for d in range(1, 31)]
+JANUARY = [[f"2026-01-{d:02d} 12:30:00", "🚗 交通 (車票/加油)", 30 * d, "捷運", f"{100 + d:012x}"] for d in range(1, 11)]
+TOTAL = sum(row[2] for row in DECEMBER + JANUARY)
+
+
+def make_storage(tmp_path):
+    ws = FakeWorksheet("Expenses", [EXPENSE_COLUMNS] + DECEMBER + JANUARY)
+    return ws, SheetsStorage(FakeGSheetsConnection([ws]), state_path=str(tmp_path / "state.json"))
+
+
+def sheet_ids(ws):
+    return [row[4] for row in ws._rows[1:]]
+
+
+def check_ledger(storage, archive):
+    # 重開 App：歸檔的總額 + 表上的明細，每筆只算一次
+    ledger = ExpenseLedger(archive=archive)
+    ledger.refresh(storage)
+    assert ledger.index.total == TOTAL
+    assert ledger.index.month_counts == {"2025-12": 30, "2026-01": 10}
+    assert len(ledger.streak.day_counts) == 40
+    return ledger
+
+
+@pytest.mark.parametrize("deleted", [False, True])
+def test_rollover_interrupted_before_the_sheet_delete_is_finished_on_the_next_run(tmp_path, monkeypatch, deleted):
+    # deleted=True：表上其實刪掉了，只是回應沒收到
+    ws, storage = make_storage(tmp_path)
+    archive = MonthArchive(str(tmp_path / "archive"))
+    frame = ExpenseLedger(archive=archive).refresh(storage)
+    delete_expenses = storage.delete_expenses
+
+    def crash(ids):
+        if deleted: delete_expenses(ids)
+        raise ConnectionError("timeout")
+
+    monkeypatch.setattr(storage, "delete_expenses", crash)
+    with pytest.raises(ConnectionError): archive.rollover(storage, frame, "2026-01")
+    monkeypatch.setattr(storage, "delete_expenses", delete_expenses)
+    assert archive.pending_ids() == [row[4] for row in DECEMBER]
+    assert len(ws._rows) - 1 == (10 if deleted else 40)
+
+    archive = MonthArchive(str(tmp_path / "archive"))
+    check_ledger(storage, archive)
+    # 下一次月結先補刪；手上還是當掉前的舊 frame 也不會把 12 月再歸檔一次
+    assert archive.rollover(storage, frame, "2026-01") == 30
+    assert archive.pending_ids() == []
+    assert sheet_ids(ws) == [row[4] for row in JANUARY]
+    assert len(archive.load_month("2025-12")) == 30 and archive.totals()["Count"].sum() == 30
+    check_ledger(storage, MonthArchive(str(tmp_path / "archive")))
@@ -0,0 +1,58 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from archive import MonthArchive
+from benchmarks.fake_gsheets import FakeGSheetsConnection, FakeWorksheet
+from bulk import DedupeIndex, dedupe_keys, export_csv, prepare_import
+from ledger import ExpenseLedger
+from storage import EXPENSE_COLUMNS, SheetsStorage
+
+ROWS = [[f"2025-12-{d:02d} 08:00:00", "🍔 飲食 (三餐/飲料)", 65, "咖啡", f"{d:012x}"] for d in range(1, 31)] \
+    + [[f"2026-01-{d:02d} 12:30:00", "🚗 交通 (車票/加油)", 30 * d, "捷運", f"{100 + d:012x}"] for d in range(1, 11)]
+
+
+def csv_file(text):
+    return io.BytesIO(text.encode())
+
+
+def ledger_of(rows):
+    ledger = ExpenseLedger()
+    ledger.load(pd.DataFrame(rows, columns=EXPENSE_COLUMNS))
+    return ledger
+
+
+def test_take_counts_repeats_of_the_same_key():
+    # 表上已經有 1 杯：匯入 3 杯只多 2 杯；分兩塊匯入也一樣
+    day = pd.Series(pd.to_datetime(["2026-01-05 08:00:00"]))
+    key = dedupe_keys(day, [65], ["咖啡"])[0]
+    index = DedupeIndex()
+    index.add_existing(day, np.array([65]), np.array(["咖啡"]))
+    assert index.take([key, key]).tolist() == [False, True]
+    assert index.take([key]).tolist() == [True]
+
+
+def test_two_identical_coffees_on_the_same_day_stay_two_rows():
+    csv = "日期,分類,金額,備註\n2026-01-05,🍔 飲食 (三餐/飲料),65,咖啡\n2026-01-05,🍔 飲食 (三餐/飲料),65,咖啡\n"
+    new, report = prepare_import(csv_file(csv), ledger_of([]).frame)
+    assert len(new) == 2 and new["ID"].nunique() == 2 and report["duplicates"] == 0
+    # 已經記了一杯 (有時間) 的話，同一天的兩杯只補一杯
+    frame = ledger_of([["2026-01-05 08:12:00", "🍔 飲食 (三餐/飲料)", 65, "咖啡", "aaaaaaaaaaa1"]]).frame
+    new, report = prepare_import(csv_file(csv), frame)
+    assert len(new) == 1 and report["duplicates"] == 1
+
+
+def test_reimporting_an_export_adds_nothing(tmp_path):
+    # 匯出含歸檔月份 (12 月) 與目前的紀錄；原檔匯回去一筆都不會多
+    storage = SheetsStorage(FakeGSheetsConnection([FakeWorksheet("Expenses", [EXPENSE_COLUMNS] + ROWS)]),
+                            state_path=str(tmp_path / "state.json"))
+    archive = MonthArchive(str(tmp_path / "archive"))
+    ledger = ExpenseLedger(archive=archive)
+    assert archive.rollover(storage, ledger.refresh(storage), "2026-01") == 30
+    ledger.invalidate()
+    ledger.refresh(storage)
+    with export_csv(ledger.frame, archive) as out:
+        new, report = prepare_import(out, ledger.frame, archive, chunksize=7)
+    assert report["read"] == len(ROWS) and report["imported"] == 0 and report["duplicates"] == len(ROWS)
+    assert new.empty and list(new.columns) == EXPENSE_COLUMNS
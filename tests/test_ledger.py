@@ -0,0 +1,98 @@
+import random
+from collections import Counter
+from datetime import date, timedelta
+
+import pandas as pd
+
+from benchmarks.fake_gsheets import FakeGSheetsConnection, FakeWorksheet
+from ledger import ExpenseLedger, StreakTracker
+from storage import EXPENSE_COLUMNS, SheetsStorage
+
+CATEGORIES = ["🍔 飲食 (三餐/飲料)", "🚗 交通 (車票/加油)", "💸 其他"]
+ROWS = [[f"2026-01-0{i} 12:00:00", "🍔 飲食 (三餐/飲料)", 100 * i, "午餐", f"{i:012x}"] for i in range(1, 8)]
+
+
+def test_load_picks_up_in_place_edits():
+    ledger = ExpenseLedger()
+    ledger.load(pd.DataFrame(ROWS, columns=EXPENSE_COLUMNS))
+    edited = [list(row) for row in ROWS]
+    edited[3][2] = 9999
+    ledger.load(pd.DataFrame(edited, columns=EXPENSE_COLUMNS))
+    assert ledger.index.total == sum(row[2] for row in edited)
+
+
+def test_own_append_is_not_mistaken_for_an_edit(tmp_path):
+    conn = FakeGSheetsConnection([FakeWorksheet("Expenses", [EXPENSE_COLUMNS] + ROWS)])
+    storage = SheetsStorage(conn, state_path=str(tmp_path / "state.json"))
+    ledger = ExpenseLedger()
+    ledger.load(storage.read_expenses(ttl=0))
+    rows = [{"Date": "2026-01-09 08:00:00", "Category": "💸 其他", "Amount": 120, "Note": "咖啡"}]
+    storage.append_expenses(rows)
+    ledger.append(rows)
+    version = ledger.version
+    ledger.load(storage.read_expenses(ttl=0))
+    assert ledger.version == version
+
+
+# --- 🔁 一筆一筆新增/刪除的結果要跟整份重建一樣 ---
+def random_history(seed, steps=200, every=5, days=range(-20, 70)):
+    # 同一天、同一秒好幾筆，跨月，補記以前的日子，偶爾沒有日期；每 every 步回傳一次 (逐筆更新的 ledger, 目前的列)
+    rng = random.Random(seed)
+    ledger, rows = ExpenseLedger(), []
+    # 前半段多半在新增，後半段多半在刪除 (月份、分類、連勝都會被刪光)
+    for step in range(steps):
+        if rows and rng.random() < (0.3 if step < steps // 2 else 0.8):
+            # 有時刪最新的一筆 (像 Undo 或刪掉今天記錯的)，其餘隨便挑
+            latest = max(range(len(rows)), key=lambda i: rows[i][0])
+            row = rows.pop(latest if rng.random() < 0.3 else rng.randrange(len(rows)))
+            ledger.remove(row[4])
+        else:
+            day = date(2026, 1, 1) + timedelta(days=rng.choice(days))
+            when = "" if rng.random() < 0.03 else f"{day} {rng.choice(['08:30:00', '12:00:00', '19:45:00'])}"
+            row = [when, rng.choice(CATEGORIES), rng.randrange(10, 500, 10), rng.choice(["", "咖啡", "午餐"]), f"{step:012x}"]
+            rows.append(row)
+            ledger.append([dict(zip(EXPENSE_COLUMNS, row))])
+        if step % every == every - 1: yield ledger, rows
+
+
+def rebuilt(rows):
+    ledger = ExpenseLedger()
+    ledger.load(pd.DataFrame(rows, columns=EXPENSE_COLUMNS))
+    return ledger
+
+
+def totals(index):
+    # 浮點加減後會剩下 1e-12 這種零頭；刪光的分類在 category_totals 留 0 也算一樣
+    kept = lambda d: {k: round(v, 6) for k, v in d.items() if round(v, 6)}
+    return round(index.total, 6), kept(index.month_totals), index.month_counts, kept(index.month_category), kept(index.category_totals)
+
+
+def test_aggregate_index_matches_a_full_rebuild():
+    for ledger, rows in random_history(seed=4):
+        full = rebuilt(rows)
+        assert totals(ledger.index) == totals(full.index)
+        assert ledger.index.months() == full.index.months()
+        for month in [None] + full.index.months():
+            got, want = ledger.index.category_frame(month), full.index.category_frame(month)
+            assert dict(zip(got["Category"], got["Amount"].round(6))) == dict(zip(want["Category"], want["Amount"].round(6)))
+
+
+def test_recent_index_pages_match_a_full_rebuild():
+    for ledger, rows in random_history(seed=9):
+        full = rebuilt(rows)
+        assert ledger.recent.categories() == full.recent.categories()
+        for category in [None] + full.recent.categories():
+            for month in [None] + full.index.months():
+                for offset, limit in ((0, 7), (7, 7), (0, 1000)):
+                    assert ledger.recent.page(offset, limit, month, category) == full.recent.page(offset, limit, month, category)
+
+
+def test_streak_matches_a_full_rebuild():
+    # 中間空一天：前面一段比最後一段長，刪掉最後一天時走的是只減一天的捷徑；每一步都比 (重建只用每日筆數，很便宜)
+    for ledger, rows in random_history(seed=5, every=1, days=[d for d in range(40) if d != 28]):
+        got, want = ledger.streak, StreakTracker()
+        want.rebuild(Counter(date.fromisoformat(row[0][:10]) for row in rows if row[0]))
+        assert got.day_counts == want.day_counts
+        assert (got.last_date, got.current, got.longest) == (want.last_date, want.current, want.longest)
+        for today in [date(2026, 1, 1) + timedelta(days=d) for d in range(-1, 42)]:
+            assert got.current_streak(today) == want.current_streak(today)
@@ -0,0 +1,162 @@
+from benchmarks.fake_gsheets import FakeGSheetsConnection, FakeWorksheet
+from storage import COUPON_COLUMNS, EXPENSE_COLUMNS, SheetsStorage, SQLiteStorage
+
+
+def make_sqlite(tmp_path, rows):
+    conn = FakeGSheetsConnection([FakeWorksheet("Expenses", [EXPENSE_COLUMNS] + rows), FakeWorksheet("Coupons", [COUPON_COLUMNS])])
+    return SQLiteStorage(str(tmp_path / "ledger.sqlite"), remote=SheetsStorage(conn, state_path=str(tmp_path / "state.json")))
+
+
+def test_sqlite_read_keeps_insertion_order(tmp_path):
+    # ID 是亂數 hex，讀回來要照寫入順序，不能照 ID 排 (Undo 靠最後一列)
+    ids = ["ffeb00000001", "000000000002", "a00000000003"]
+    storage = make_sqlite(tmp_path, [[f"2026-01-0{i + 1} 12:00:00", "💸 其他", 100, "", uid] for i, uid in enumerate(ids)])
+    storage.pull()
+    assert storage.read_expenses()["ID"].tolist() == ids
+    storage.append_expenses([{"ID": "0aaaaaaaaaa4", "Date": "2026-01-04 12:00:00", "Category": "💸 其他", "Amount": 50, "Note": ""}])
+    assert storage.read_expenses()["ID"].tolist() == ids + ["0aaaaaaaaaa4"]
+
+
+def test_sheet_rows_without_id_get_a_persisted_id_before_reading(tmp_path):
+    conn = FakeGSheetsConnection([FakeWorksheet("Expenses", [EXPENSE_COLUMNS, ["2026-01-01 12:00:00", "💸 其他", 100, "手打的", ""]])])
+    storage = SheetsStorage(conn, state_path=str(tmp_path / "state.json"))
+    expense_id = storage.read_expenses(ttl=0)["ID"].iloc[0]
+    assert expense_id and storage.read_expenses(ttl=0)["ID"].iloc[0] == expense_id
+    assert storage.delete_expense(expense_id)
+
+
+def test_read_skips_the_id_check_when_every_row_has_an_id(tmp_path):
+    ws = FakeWorksheet("Expenses", [EXPENSE_COLUMNS, ["2026-01-01 12:00:00", "💸 其他", 100, "", "aaaaaaaaaaa1"]])
+    storage = SheetsStorage(FakeGSheetsConnection([ws]), state_path=str(tmp_path / "state.json"))
+    storage.read_expenses(ttl=0)
+    assert ws.calls == 1 and ws.full_reads == 1
+    ws._rows.append(["2026-01-02 12:00:00", "💸 其他", 200, "手打的", ""])
+    assert storage.read_expenses(ttl=0)["ID"].str.strip().ne("").all()
+    assert ws.full_reads == 3
+
+
+def test_appended_ids_are_sent_as_text(tmp_path):
+    ws = FakeWorksheet("Expenses", [EXPENSE_COLUMNS])
+    storage = SheetsStorage(FakeGSheetsConnection([ws]), state_path=str(tmp_path / "state.json"))
+    sent = []
+    append_rows = ws.append_rows
+    ws.append_rows = lambda values, **kwargs: sent.extend(values) or append_rows(values, **kwargs)
+    storage.append_expenses([{"ID": "012345678901", "Date": "2026-01-01 12:00:00", "Category": "💸 其他", "Amount": 1, "Note": ""}])
+    assert sent[0][EXPENSE_COLUMNS.index("ID")] == "'012345678901"
+    assert storage.delete_expense("012345678901")
+
+
+def test_ensure_ids_writes_only_the_blank_cells(tmp_path):
+    # ID 欄比日期欄長 (最後一列日期被清掉)；已經有的 ID 不能被重寫
+    rows = [["2026-01-01 12:00:00", "💸 其他", 100, "", "aaaaaaaaaaa1"],
+            ["2026-01-02 12:00:00", "💸 其他", 200, "手打的", ""],
+            ["", "", "", "", "aaaaaaaaaaa3"]]
+    ws = FakeWorksheet("Expenses", [EXPENSE_COLUMNS] + rows)
+    storage = SheetsStorage(FakeGSheetsConnection([ws]), state_path=str(tmp_path / "state.json"))
+    sent = []
+    batch_update = ws.batch_update
+    ws.batch_update = lambda data, **kwargs: sent.extend(data) or batch_update(data, **kwargs)
+    assert storage.ensure_ids() == 1
+    assert [item["range"] for item in sent] == ["E3"]
+    assert [r[4] for r in ws._rows] == ["ID", "aaaaaaaaaaa1", sent[0]["values"][0][0], "aaaaaaaaaaa3"]
+    assert storage.ensure_ids() == 0 and len(sent) == 1
+
+
+# --- 🔄 outbox 同步：Google Sheet 的 append_rows 失敗一次 ---
+def expense(uid, amount=100):
+    return {"ID": uid, "Date": "2026-01-01 12:00:00", "Category": "💸 其他", "Amount": amount, "Note": ""}
+
+
+def flaky_sheet(storage, fail_after_write):
+    # append_rows 失敗一次；fail_after_write=True 是「其實寫進去了，只是回應沒收到」
+    ws = storage.remote.conn.client.worksheets["Expenses"]
+    append_rows, sent, failed = ws.append_rows, [], []
+
+    def append(values, **kwargs):
+        sent.append([row[EXPENSE_COLUMNS.index("ID")].lstrip("'") for row in values])
+        if failed: return append_rows(values, **kwargs)
+        failed.append(True)
+        if fail_after_write: append_rows(values, **kwargs)
+        raise ConnectionError("timeout")
+
+    ws.append_rows = append
+    return ws, sent
+
+
+def sync(storage):
+    # 跟 _sync_loop 一樣：送到 outbox 清空，失敗就退避
+    try:
+        while storage.flush(): pass
+        storage.last_sync_error, storage.failures = None, 0
+    except Exception as e:
+        storage._sync_failed(e)
+
+
+def sheet_ids(ws):
+    return [row[EXPENSE_COLUMNS.index("ID")] for row in ws._rows[1:]]
+
+
+def test_flush_retry_after_a_lost_response_does_not_duplicate(tmp_path):
+    storage = make_sqlite(tmp_path, [])
+    ws, sent = flaky_sheet(storage, fail_after_write=True)
+    storage.append_expenses([expense("aaaaaaaaaaa1")])
+    storage.append_expenses([expense("aaaaaaaaaaa2")])
+    sync(storage)
+    assert storage.failures == 1 and storage.pending_count() == 2
+    storage.append_expenses([expense("aaaaaaaaaaa3")])
+    sync(storage)
+    # 重試時先查表上已有的 ID，只補送還沒寫進去的那一筆
+    assert sent == [["aaaaaaaaaaa1", "aaaaaaaaaaa2"], ["aaaaaaaaaaa3"]]
+    assert sheet_ids(ws) == ["aaaaaaaaaaa1", "aaaaaaaaaaa2", "aaaaaaaaaaa3"]
+    assert storage.failures == 0 and storage.pending_count() == 0
+
+
+def test_flush_retry_after_a_failed_write_sends_everything(tmp_path):
+    storage = make_sqlite(tmp_path, [])
+    ws, sent = flaky_sheet(storage, fail_after_write=False)
+    storage.append_expenses([expense("aaaaaaaaaaa1"), expense("aaaaaaaaaaa2")])
+    sync(storage)
+    assert sheet_ids(ws) == [] and storage.pending_count() == 1
+    sync(storage)
+    assert sent == [["aaaaaaaaaaa1", "aaaaaaaaaaa2"]] * 2
+    assert sheet_ids(ws) == ["aaaaaaaaaaa1", "aaaaaaaaaaa2"] and storage.pending_count() == 0
+
+
+def test_append_and_delete_in_the_same_batch_cancel_out(tmp_path):
+    storage = make_sqlite(tmp_path, [])
+    ws, sent = flaky_sheet(storage, fail_after_write=False)
+    deletes = []
+    delete_rows = ws.delete_rows
+    ws.delete_rows = lambda *args: deletes.append(args) or delete_rows(*args)
+    storage.append_expenses([expense("aaaaaaaaaaa1"), expense("aaaaaaaaaaa2")])
+    sync(storage)
+    # 還沒送出就刪掉：重試時新增、刪除都不必送
+    assert storage.delete_expense("aaaaaaaaaaa1")
+    sync(storage)
+    assert sent[-1] == ["aaaaaaaaaaa2"] and deletes == []
+    assert sheet_ids(ws) == ["aaaaaaaaaaa2"] and storage.pending_count() == 0
+
+
+def test_delete_many_drops_ids_that_are_still_batched(tmp_path):
+    storage = make_sqlite(tmp_path, [["2025-12-01 12:00:00", "💸 其他", 100, "", "bbbbbbbbbbb1"]])
+    storage.pull()
+    ws, sent = flaky_sheet(storage, fail_after_write=False)
+    storage.append_expenses([expense("aaaaaaaaaaa1"), expense("aaaaaaaaaaa2")])
+    sync(storage)
+    assert storage.delete_expenses(["bbbbbbbbbbb1", "aaaaaaaaaaa1"]) == 2
+    sync(storage)
+    assert sent[-1] == ["aaaaaaaaaaa2"]
+    assert sheet_ids(ws) == ["aaaaaaaaaaa2"] and storage.pending_count() == 0
+    assert storage.read_expenses()["ID"].tolist() == ["aaaaaaaaaaa2"]
+
+
+def test_sync_failures_back_off_exponentially(tmp_path, monkeypatch):
+    storage = make_sqlite(tmp_path, [])
+    def offline(rows): raise ConnectionError("offline")
+    monkeypatch.setattr(storage.remote, "append_expenses", offline)
+    storage.append_expenses([expense("aaaaaaaaaaa1")])
+    for failures in (1, 2, 3, 9, 10):
+        while storage.failures < failures: sync(storage)
+        wait = storage.sync_status()["retry_in"]
+        assert min(2 ** failures, 300) * 0.8 - 1 < wait <= min(2 ** failures, 300) * 1.2
+    assert isinstance(storage.sync_status()["error"], ConnectionError) and storage.pending_count() == 1